@@ -1,8 +1,6 @@
 import logging
 import os
 
-from .dynamodb import create_tables, list_tables
-
 logging_level = os.environ.get("LOGGING_LEVEL", "INFO")
 logging.basicConfig(
     level=getattr(logging, logging_level),
@@ -11,9 +9,3 @@ logging.basicConfig(
 )
 
 logger = logging.getLogger(__name__)
-
-logger.info("Initializing DynamoDB tables...")
-create_tables()
-
-tables = list_tables()
-logger.info(f"Existing tables: {tables}")
@@ -1,13 +1,80 @@
+import asyncio
+import csv
+import gzip
+import hmac
+import io
+import json
 import os
+import time
+from decimal import Decimal
+from itertools import chain
 
-from flask import Flask, jsonify, redirect, request, url_for
+import click
+from flask import Flask, Response, jsonify, redirect, request, url_for
 
-from .models import UserModel
+from . import compression, export, http_cache, metrics, throttle, views
+from .async_models import AsyncUserModel
+from .cache import user_cache
+from .dynamodb import IS_OFFLINE, create_tables, list_tables
+from .http_cache import conditional
+from .json_provider import JSONProvider
+from .models import VERSION_FIELD, UserModel
+from .profiler import profiler
+from .singleflight import scan_pages, user_reads
+from .throttle import CapacityExceeded, retry_after_header
 from .views import bp as views_bp
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 app.secret_key = os.environ.get("SECRET_KEY", "dev-secret-key")
 app.register_blueprint(views_bp)
+# after_request hooks run in reverse order: ETags are computed before compression
+compression.init_app(app)
+http_cache.init_app(app)
+metrics.init_app(app)
+throttle.init_app(app)
+metrics.registry.collectors += [
+    metrics.cache_collector("user_cache", user_cache),
+    metrics.singleflight_collector("user_get_coalesced", user_reads),
+    metrics.singleflight_collector("scan_page_coalesced", scan_pages),
+]
+
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 1000))
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 1000))
+# Cap for full-table HTTP responses. On Lambda serverless-wsgi buffers the
+# whole body and API Gateway rejects responses over 6 MB (4 MiB stays under it
+# even base64-encoded); 0 streams without a cap outside Lambda
+MAX_RESPONSE_BYTES = int(os.environ.get("MAX_RESPONSE_BYTES", 4 * 1024 * 1024))
+# Bearer token for /admin routes; unset denies them except offline (local dev)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+
+def _bounded(chunks):
+    # Buffers up to MAX_RESPONSE_BYTES so an oversized body becomes a clean
+    # 413 rather than a failed invocation; None means the cap was exceeded
+    if not MAX_RESPONSE_BYTES:
+        return chunks
+    body, size = [], 0
+    for chunk in chunks:
+        size += len(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        if size > MAX_RESPONSE_BYTES:
+            return None
+        body.append(chunk)
+    return body
+
+
+def _too_large(hint):
+    message = f"Response exceeds {MAX_RESPONSE_BYTES} bytes; {hint}"
+    return jsonify({"error": message}), 413
+
+
+def _error_response(e):
+    if isinstance(e, CapacityExceeded):
+        response = jsonify({"error": str(e)})
+        response.status_code = 429
+        response.headers["Retry-After"] = retry_after_header(e)
+        return response
+    return jsonify({"error": str(e)}), 500
 
 
 @app.route("/health", methods=["GET"])
@@ -15,36 +82,355 @@ def health_check():
     return jsonify({"status": "healthy"})
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return metrics.metrics_response()
+
+
+def _is_admin():
+    if not ADMIN_TOKEN:
+        return bool(IS_OFFLINE)
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+
+@app.route("/admin/profile", methods=["GET", "DELETE"])
+def access_profile():
+    if not _is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+    if request.method == "DELETE":
+        profiler.reset()
+        return jsonify({"message": "Profile reset"})
+    try:
+        limit = _parse_limit(request.args.get("limit"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(profiler.summary(limit=limit))
+
+
+def _created_response(user):
+    # The version is what a later PATCH sends back for optimistic locking
+    return (
+        jsonify(
+            {
+                "message": "User created",
+                "user_id": user["user_id"],
+                "version": user[VERSION_FIELD],
+            }
+        ),
+        201,
+    )
+
+
 @app.route("/users", methods=["POST"])
 def create_user():
     data = request.json
     user = {"user_id": data["user_id"], "name": data["name"], "email": data["email"]}
-    print("USER DATA app", user)
     try:
-        UserModel.create(user)
-        return jsonify({"message": "User created", "user_id": data["user_id"]}), 201
+        created = UserModel.create(user)
+        return _created_response(created)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _error_response(e)
+
+
+def _parse_fields(value):
+    if not value:
+        return None
+    return [field.strip() for field in value.split(",") if field.strip()]
 
 
 @app.route("/users/<user_id>", methods=["GET"])
+@conditional()
 def get_user(user_id):
+    if http_cache.prefers_html(request.headers.get("Accept")):
+        response = app.make_response(views.view_user(user_id))
+    else:
+        response = app.make_response(_get_user_json(user_id))
+    response.vary.add("Accept")
+    return response
+
+
+def _get_user_json(user_id):
     try:
-        user = UserModel.get(user_id)
+        user = UserModel.get(user_id, fields=_parse_fields(request.args.get("fields")))
         return jsonify(user)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         if str(e) == "DoesNotExist":
             return jsonify({"error": "User not found"}), 404
-        return jsonify({"error": str(e)}), 500
+        return _error_response(e)
+
+
+def _parse_limit(value):
+    if value is None:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be a positive integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _scan_users(page, next_cursor, limit, fields):
+    while True:
+        yield from page
+        if not next_cursor:
+            return
+        page, next_cursor = UserModel.scan_page(
+            limit=limit, cursor=next_cursor, fields=fields
+        )
+
+
+def _json_array(users):
+    yield "["
+    first = True
+    for user in users:
+        yield ("" if first else ",") + app.json.dumps(user)
+        first = False
+    yield "]"
 
 
 @app.route("/users", methods=["GET"])
+@conditional()
 def list_users():
     try:
-        users = UserModel.scan()
-        return jsonify(users)
+        limit = _parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor")
+        fields = _parse_fields(request.args.get("fields"))
+        email = request.args.get("email")
+        if email:
+            return jsonify(UserModel.find_by_email(email, fields=fields))
+        stream = request.args.get("stream") == "1"
+        if (limit or cursor) and not stream:
+            users, next_cursor = UserModel.scan_page(
+                limit=limit, cursor=cursor, fields=fields
+            )
+            return jsonify({"items": users, "next_cursor": next_cursor})
+        # Whole-table bodies are built page by page and the scan stops as soon
+        # as they pass the cap, so a large table never sits in memory
+        if request.args.get("parallel") == "1":
+            users = UserModel.iter_parallel_scan(fields=fields)
+        else:
+            # Fetch the first page eagerly so errors still map to a status code
+            page, next_cursor = UserModel.scan_page(
+                limit=limit, cursor=cursor, fields=fields
+            )
+            users = _scan_users(page, next_cursor, limit, fields)
+        body = _bounded(_json_array(users))
+        if body is None:
+            return _too_large("page with limit and cursor instead")
+        return Response(body, mimetype="application/json")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return _error_response(e)
+
+
+@app.route("/users/export", methods=["GET"])
+def export_users():
+    fmt = request.args.get("format", "ndjson")
+    try:
+        chunks = export.export_chunks(
+            fmt, app.json.dumps, fields=_parse_fields(request.args.get("fields"))
+        )
+        # Pull the first page now so errors still map to a status code
+        body = _bounded(chain([next(chunks)], chunks))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return _error_response(e)
+    if body is None:
+        return _too_large("run `flask export-users` for full exports")
+    filename = f"users.{fmt}"
+    if request.args.get("gzip") == "1":
+        body = compression.compress_stream(body, "gzip")
+        response = Response(body, mimetype="application/gzip")
+        filename += ".gz"
+    else:
+        response = Response(body, mimetype=export.FORMATS[fmt])
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+def _parse_user_ids(data):
+    user_ids = (data or {}).get("user_ids")
+    if not isinstance(user_ids, list) or not all(
+        isinstance(user_id, str) for user_id in user_ids
+    ):
+        raise ValueError("user_ids must be a list of strings")
+    if len(user_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} user_ids allowed")
+    return user_ids
+
+
+@app.route("/users/count", methods=["GET"])
+def count_users():
+    try:
+        return jsonify({"count": UserModel.count()})
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _error_response(e)
+
+
+@app.route("/users/batch-get", methods=["POST"])
+def batch_get_users():
+    try:
+        user_ids = _parse_user_ids(request.get_json(silent=True))
+        users, missing = UserModel.batch_get(user_ids)
+        return jsonify({"items": users, "missing": missing})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return _error_response(e)
+
+
+def _parse_filter(data):
+    filters = data.get("filter")
+    if not isinstance(filters, dict) or not filters:
+        raise ValueError("filter must be a non-empty object")
+    if not all(isinstance(value, (str, int, float)) for value in filters.values()):
+        raise ValueError("filter values must be strings or numbers")
+    # Scanned numbers are Decimals and never equal a float
+    return {
+        name: Decimal(str(value)) if isinstance(value, float) else value
+        for name, value in filters.items()
+    }
+
+
+@app.route("/users/batch-delete", methods=["POST"])
+def batch_delete_users():
+    data = request.get_json(silent=True)
+    try:
+        if not isinstance(data, dict):
+            raise ValueError("Body must be an object with user_ids or filter")
+        if "filter" in data and "user_ids" in data:
+            raise ValueError("Provide either user_ids or filter, not both")
+        if "filter" in data:
+            user_ids = UserModel.iter_matching_ids(_parse_filter(data))
+        else:
+            user_ids = _parse_user_ids(data)
+        deleted, not_found, failures = UserModel.batch_delete(user_ids)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return _error_response(e)
+    errors = [{"user_id": user_id, "error": error} for user_id, error in failures]
+    return jsonify(
+        {
+            "deleted": deleted,
+            "not_found": not_found,
+            "failed": len(errors),
+            "errors": errors,
+        }
+    )
+
+
+def _user_from_record(record):
+    if not isinstance(record, dict):
+        raise ValueError("Record must be an object")
+    fields = ("user_id", "name", "email")
+    missing = [f for f in fields if not record.get(f)]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    # A wrong type would fail the whole BatchWriteItem chunk in DynamoDB
+    not_strings = [f for f in fields if not isinstance(record[f], str)]
+    if not_strings:
+        raise ValueError(f"Fields must be strings: {', '.join(not_strings)}")
+    return {field: record[field] for field in fields}
+
+
+def _iter_import_records(stream, is_csv, errors):
+    # Lines are decoded one at a time so a bad byte or malformed CSV row late
+    # in the body becomes that line's error instead of failing the request
+    # after earlier chunks were already written
+    line_no = 0
+
+    def lines():
+        nonlocal line_no
+        for line_no, raw in enumerate(io.BufferedReader(stream), 1):
+            try:
+                yield raw.decode("utf-8")
+            except UnicodeDecodeError:
+                errors.append({"line": line_no, "error": "Invalid UTF-8"})
+
+    if is_csv:
+        rows = csv.DictReader(lines())
+    else:
+        rows = (line for line in lines() if line.strip())
+    while True:
+        try:
+            row = next(rows)
+            user = _user_from_record(row if is_csv else json.loads(row))
+        except StopIteration:
+            return
+        except (ValueError, csv.Error) as e:
+            errors.append({"line": line_no, "error": str(e)})
+            continue
+        yield line_no, user
+
+
+@app.route("/users/import", methods=["POST"])
+def import_users():
+    is_csv = request.mimetype == "text/csv"
+    errors = []
+    started = time.perf_counter()
+    try:
+        records = _iter_import_records(request.stream, is_csv, errors)
+        written, failures = UserModel.batch_create(records)
+    except Exception as e:
+        return _error_response(e)
+    elapsed = time.perf_counter() - started
+    errors.extend({"line": line, "error": error} for line, error in failures)
+    errors.sort(key=lambda error: error["line"])
+    return jsonify(
+        {
+            "written": written,
+            "failed": len(errors),
+            "errors": errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(written / elapsed, 1) if elapsed else None,
+        }
+    )
+
+
+def _parse_changes(data):
+    if not isinstance(data, dict):
+        raise ValueError("Body must be an object of changed attributes")
+    changes = dict(data)
+    version = changes.pop("version", None)
+    if version is not None and (
+        isinstance(version, bool) or not isinstance(version, int)
+    ):
+        raise ValueError("version must be an integer")
+    for field, value in changes.items():
+        if field in ("name", "email") and not (value and isinstance(value, str)):
+            raise ValueError(f"{field} must be a non-empty string")
+        if isinstance(value, float):
+            # DynamoDB numbers must be Decimals
+            changes[field] = Decimal(str(value))
+        elif value is not None and not isinstance(value, (str, int)):
+            raise ValueError(f"{field} must be a string, number, boolean or null")
+    return changes, version
+
+
+@app.route("/users/<user_id>", methods=["PATCH"])
+def update_user(user_id):
+    try:
+        changes, version = _parse_changes(request.get_json(silent=True))
+        attributes = UserModel.update(user_id, changes, expected_version=version)
+        return jsonify(
+            {"message": "User updated", "user_id": user_id, "attributes": attributes}
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        if str(e) == "DoesNotExist":
+            return jsonify({"error": "User not found"}), 404
+        if str(e) == "VersionConflict":
+            return jsonify({"error": "Version conflict"}), 409
+        return _error_response(e)
 
 
 @app.route("/users/<user_id>", methods=["DELETE"])
@@ -53,7 +439,105 @@ def delete_user(user_id):
         UserModel.delete(user_id)
         return jsonify({"message": "User deleted"}), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _error_response(e)
+
+
+@app.route("/async/users", methods=["POST"])
+async def async_create_user():
+    data = request.json
+    user = {"user_id": data["user_id"], "name": data["name"], "email": data["email"]}
+    try:
+        created = await AsyncUserModel.create(user)
+        return _created_response(created)
+    except Exception as e:
+        return _error_response(e)
+
+
+@app.route("/async/users/<user_id>", methods=["GET"])
+@conditional()
+async def async_get_user(user_id):
+    try:
+        user = await AsyncUserModel.get(user_id)
+        return jsonify(user)
+    except Exception as e:
+        if str(e) == "DoesNotExist":
+            return jsonify({"error": "User not found"}), 404
+        return _error_response(e)
+
+
+@app.route("/async/users", methods=["GET"])
+@conditional()
+async def async_list_users():
+    try:
+        limit = _parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor")
+        if limit or cursor:
+            users, next_cursor = await AsyncUserModel.scan_page(limit, cursor)
+            return jsonify({"items": users, "next_cursor": next_cursor})
+        page, next_cursor = await AsyncUserModel.scan_page()
+        # The rest is scanned and serialized off the event loop, page by page,
+        # and stops at the cap like the sync route
+        users = _scan_users(page, next_cursor, None, None)
+        body = await asyncio.to_thread(_bounded, _json_array(users))
+        if body is None:
+            return _too_large("page with limit and cursor instead")
+        return Response(body, mimetype="application/json")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return _error_response(e)
+
+
+@app.route("/async/users/batch-get", methods=["POST"])
+async def async_batch_get_users():
+    try:
+        user_ids = _parse_user_ids(request.get_json(silent=True))
+        users, missing = await AsyncUserModel.batch_get(user_ids)
+        return jsonify({"items": users, "missing": missing})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return _error_response(e)
+
+
+@app.route("/async/users/<user_id>", methods=["DELETE"])
+async def async_delete_user(user_id):
+    try:
+        await AsyncUserModel.delete(user_id)
+        return jsonify({"message": "User deleted"}), 200
+    except Exception as e:
+        return _error_response(e)
+
+
+@app.cli.command("create-tables")
+def create_tables_command():
+    """Create the DynamoDB tables for local development."""
+    create_tables()
+    app.logger.info(f"Existing tables: {list_tables()}")
+
+
+@app.cli.command("export-users")
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(list(export.FORMATS)))
+@click.option("--fields", help="Comma-separated attributes to export")
+@click.option("--gzip", "compress", is_flag=True, help="gzip the output file")
+def export_users_command(output, fmt, fields, compress):
+    """Stream every user to a local NDJSON or CSV file."""
+    fmt = fmt or ("csv" if ".csv" in output else "ndjson")
+    opener = gzip.open if compress or output.endswith(".gz") else open
+    started = time.perf_counter()
+    with opener(output, "wt", encoding="utf-8", newline="") as f:
+        for chunk in export.export_chunks(fmt, app.json.dumps, _parse_fields(fields)):
+            f.write(chunk)
+    elapsed = time.perf_counter() - started
+    app.logger.info(f"Exported users to {output} in {elapsed:.1f}s")
+
+
+@app.cli.command("reconcile-counts")
+def reconcile_counts_command():
+    """Rebuild the maintained user count from a full table scan."""
+    count = UserModel.reconcile_count()
+    app.logger.info(f"User count reconciled to {count}")
 
 
 @app.route("/")
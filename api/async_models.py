@@ -0,0 +1,65 @@
+import asyncio
+import functools
+import os
+from concurrent import futures
+
+from . import throttle
+from .models import BATCH_GET_SIZE, SCAN_SEGMENTS, UserModel, chunked
+
+ASYNC_WORKERS = int(os.environ.get("ASYNC_WORKERS", 32))
+
+# botocore is blocking, so calls run on a bounded pool while the event loop
+# overlaps them; size it to match DYNAMODB_MAX_POOL_CONNECTIONS
+_executor = futures.ThreadPoolExecutor(
+    max_workers=ASYNC_WORKERS, thread_name_prefix="dynamodb-async"
+)
+
+
+async def _run(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(throttle.bind(func), *args, **kwargs)
+    )
+
+
+class AsyncUserModel:
+    @staticmethod
+    async def get(user_id):
+        return await _run(UserModel.get, user_id)
+
+    @staticmethod
+    async def create(user_data):
+        return await _run(UserModel.create, user_data)
+
+    @staticmethod
+    async def delete(user_id):
+        return await _run(UserModel.delete, user_id)
+
+    @staticmethod
+    async def scan_page(limit=None, cursor=None):
+        return await _run(UserModel.scan_page, limit=limit, cursor=cursor)
+
+    @staticmethod
+    async def scan(total_segments=None):
+        total_segments = total_segments or SCAN_SEGMENTS
+        segments = await asyncio.gather(
+            *(
+                _run(UserModel.scan_segment, segment, total_segments)
+                for segment in range(total_segments)
+            )
+        )
+        return [item for segment in segments for item in segment]
+
+    @staticmethod
+    async def batch_get(user_ids):
+        unique_ids = list(dict.fromkeys(user_ids))
+        chunks = await asyncio.gather(
+            *(
+                _run(UserModel._batch_get_chunk, chunk)
+                for chunk in chunked(unique_ids, BATCH_GET_SIZE)
+            )
+        )
+        found = {item["user_id"]: item for items in chunks for item in items}
+        users = [found[uid] for uid in unique_ids if uid in found]
+        missing = [uid for uid in unique_ids if uid not in found]
+        return users, missing
@@ -0,0 +1,103 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MISS = object()
+NOT_FOUND = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize, ttl, negative_ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        # Bumped by invalidate so a fill read before a write cannot land after it
+        self._generations = OrderedDict()
+        self._counter = itertools.count(1)
+        self._floor = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return MISS
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= self._clock():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def generation(self, key):
+        # Taken before the backing read; pass it to set/set_missing
+        with self._lock:
+            return self._generations.get(key, self._floor)
+
+    def set(self, key, value, generation=None):
+        self._store(key, value, self.ttl, generation)
+
+    def set_missing(self, key, generation=None):
+        if self.negative_ttl > 0:
+            self._store(key, NOT_FOUND, self.negative_ttl, generation)
+
+    def _store(self, key, value, ttl, generation):
+        if not self.enabled:
+            return
+        with self._lock:
+            current = self._generations.get(key, self._floor)
+            if generation is not None and generation != current:
+                return
+            self._data[key] = (value, self._clock() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._generations[key] = next(self._counter)
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.maxsize:
+                # A forgotten key falls back to the floor, which is at least
+                # as new as its own bump, so stale fills still miss
+                _, self._floor = self._generations.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generations.clear()
+            self._floor = next(self._counter)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+user_cache = TTLCache(
+    maxsize=int(os.environ.get("USER_CACHE_SIZE", 0)),
+    ttl=float(os.environ.get("USER_CACHE_TTL", 30)),
+    negative_ttl=float(os.environ.get("USER_CACHE_NEGATIVE_TTL", 5)),
+)
@@ -0,0 +1,92 @@
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 500))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+# Streamed chunks are batched up to this size before each flush
+STREAM_FLUSH_SIZE = 8192
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/html",
+    "text/plain",
+}
+
+
+def supported_encodings():
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def _compressor(encoding):
+    # Returns (compress, flush, finish) callables for one response body
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return (
+        compressor.compress,
+        lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def compress(data, encoding):
+    compress_chunk, _, finish = _compressor(encoding)
+    return compress_chunk(data) + finish()
+
+
+def compress_stream(chunks, encoding):
+    compress_chunk, flush, finish = _compressor(encoding)
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_FLUSH_SIZE:
+            yield compress_chunk(b"".join(buffer)) + flush()
+            buffer, size = [], 0
+    yield compress_chunk(b"".join(buffer)) + finish()
+
+
+def compress_response(response):
+    if (
+        request.method == "HEAD"
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, _ = response.get_etag()
+    if etag:
+        # Same entity in another encoding: weak ETags still match If-None-Match
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -0,0 +1,95 @@
+import logging
+import os
+import random
+
+from botocore.exceptions import ClientError
+
+from . import dynamodb
+from .throttle import backoff
+
+logger = logging.getLogger(__name__)
+
+USER_COUNT = os.environ.get("USER_COUNT", "1") == "1"
+# Increments land on a random shard so no single counter item runs hot
+USER_COUNT_SHARDS = int(os.environ.get("USER_COUNT_SHARDS", 8))
+COUNTER_NAME = "users"
+MAX_RETRIES = 3
+
+
+def shard_keys():
+    return [
+        {"counter_id": f"{COUNTER_NAME}#{shard}"} for shard in range(USER_COUNT_SHARDS)
+    ]
+
+
+def _shard_update(delta):
+    shard = random.randrange(USER_COUNT_SHARDS)  # nosec B311
+    return {
+        "Key": {"counter_id": f"{COUNTER_NAME}#{shard}"},
+        "UpdateExpression": "ADD #total :delta",
+        "ExpressionAttributeNames": {"#total": "total"},
+        "ExpressionAttributeValues": {":delta": delta},
+    }
+
+
+def transact_update(delta):
+    # The shard ADD as a TransactWriteItems entry, so single-user writes move
+    # the count atomically with the user item
+    return {"Update": dict(_shard_update(delta), TableName=dynamodb.COUNTER_TABLE_NAME)}
+
+
+def add(delta):
+    # Batch writes only: BatchWriteItem has no transactions, so the count is
+    # adjusted afterwards and reconcile repairs any drift
+    if not USER_COUNT or not delta:
+        return
+    try:
+        dynamodb.get_counter_table().update_item(**_shard_update(delta))
+    except ClientError as e:
+        # The user write already succeeded; a reconcile repairs the drift
+        logger.warning(f"Error updating user count by {delta}: {e}")
+
+
+def total():
+    resource = dynamodb.get_dynamodb_resource()
+    table_name = dynamodb.COUNTER_TABLE_NAME
+    request = {
+        table_name: {
+            "Keys": shard_keys(),
+            "ProjectionExpression": "#total",
+            "ExpressionAttributeNames": {"#total": "total"},
+        }
+    }
+    count = 0
+    for attempt in range(MAX_RETRIES + 1):
+        response = resource.batch_get_item(RequestItems=request)
+        items = response.get("Responses", {}).get(table_name, [])
+        count += sum(int(item.get("total", 0)) for item in items)
+        request = response.get("UnprocessedKeys")
+        if not request:
+            return count
+        backoff(attempt)
+    raise Exception("UnprocessedKeys")
+
+
+def reset(count):
+    # Puts the whole count on the first shard and zeroes the rest
+    resource = dynamodb.get_dynamodb_resource()
+    keys = shard_keys()
+    for start in range(0, len(keys), 25):
+        items = [
+            dict(key, total=count if key is keys[0] else 0)
+            for key in keys[start : start + 25]
+        ]
+        request = {
+            dynamodb.COUNTER_TABLE_NAME: [{"PutRequest": {"Item": i}} for i in items]
+        }
+        for attempt in range(MAX_RETRIES + 1):
+            request = resource.batch_write_item(RequestItems=request).get(
+                "UnprocessedItems"
+            )
+            if not request:
+                break
+            backoff(attempt)
+        else:
+            raise Exception("UnprocessedItems")
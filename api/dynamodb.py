@@ -1,43 +1,113 @@
 import logging
 import os
+import threading
 
-import boto3
 from botocore.exceptions import ClientError
 
+from . import metrics
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 TABLE_NAME = os.environ.get("TABLE_NAME", "user_table")
+EMAIL_INDEX = os.environ.get("EMAIL_INDEX", "email-index")
+COUNTER_TABLE_NAME = os.environ.get("COUNTER_TABLE_NAME", "user_counters")
 IS_OFFLINE = os.environ.get("IS_OFFLINE")
+# "dynamodb" (default) or "memory"; STORAGE_PATH persists the memory engine to SQLite
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "dynamodb")
+STORAGE_PATH = os.environ.get("STORAGE_PATH")
+
+# Handles are built on first use so importing the package stays cheap on cold start
+dynamodb_client = None
+dynamodb_resource = None
+_handles_lock = threading.Lock()
 
-if IS_OFFLINE:
+
+def _connection_kwargs():
+    if not IS_OFFLINE:
+        # For AWS Lambda execution
+        return {}
     # For local development AWS credentials need to be passed, but values can be faked
-    dynamodb_client = boto3.client(
-        "dynamodb",
-        endpoint_url=os.environ.get("DYNAMODB_HOST", None),
-        region_name=os.environ.get("AWS_REGION", "us-east-1"),
-        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID", "fake-key"),
-        aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY", "fake-secret"),
+    return {
+        "endpoint_url": os.environ.get("DYNAMODB_HOST", None),
+        "region_name": os.environ.get("AWS_REGION", "us-east-1"),
+        "aws_access_key_id": os.environ.get("AWS_ACCESS_KEY_ID", "fake-key"),
+        "aws_secret_access_key": os.environ.get("AWS_SECRET_ACCESS_KEY", "fake-secret"),
+    }
+
+
+def client_config():
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=int(os.environ.get("DYNAMODB_MAX_POOL_CONNECTIONS", 50)),
+        connect_timeout=float(os.environ.get("DYNAMODB_CONNECT_TIMEOUT", 2)),
+        read_timeout=float(os.environ.get("DYNAMODB_READ_TIMEOUT", 5)),
+        retries={
+            "mode": os.environ.get("DYNAMODB_RETRY_MODE", "standard"),
+            "max_attempts": int(os.environ.get("DYNAMODB_MAX_ATTEMPTS", 3)),
+        },
+        tcp_keepalive=os.environ.get("DYNAMODB_TCP_KEEPALIVE", "1") == "1",
     )
 
-    dynamodb_resource = boto3.resource(
-        "dynamodb",
-        endpoint_url=os.environ.get("DYNAMODB_HOST", None),
-        region_name=os.environ.get("AWS_REGION", "us-east-1"),
-        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID", "fake-key"),
-        aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY", "fake-secret"),
+
+def memory_resource(path=None):
+    from .storage import MemoryResource
+
+    return MemoryResource(path, keys={COUNTER_TABLE_NAME: "counter_id"})
+
+
+def _build_handles():
+    global dynamodb_client, dynamodb_resource
+    if STORAGE_BACKEND == "memory":
+        dynamodb_resource = memory_resource(STORAGE_PATH)
+        return
+
+    import boto3
+
+    session = boto3.session.Session()
+    dynamodb_resource = session.resource(
+        "dynamodb", config=client_config(), **_connection_kwargs()
     )
-else:
-    # For AWS Lambda execution
-    dynamodb_client = boto3.client("dynamodb")
-    dynamodb_resource = boto3.resource("dynamodb")
+    # The resource's own client is reused so both share one HTTP connection pool
+    dynamodb_client = dynamodb_resource.meta.client
+    metrics.register_client_hooks(dynamodb_client)
+
+
+def get_dynamodb_client():
+    if STORAGE_BACKEND == "memory":
+        raise RuntimeError("The memory storage backend has no DynamoDB client")
+    if dynamodb_client is None:
+        with _handles_lock:
+            if dynamodb_client is None:
+                _build_handles()
+    return dynamodb_client
+
+
+def get_dynamodb_resource():
+    if dynamodb_resource is None:
+        with _handles_lock:
+            if dynamodb_resource is None:
+                _build_handles()
+    return dynamodb_resource
+
+
+EMAIL_INDEX_DEFINITION = {
+    "IndexName": EMAIL_INDEX,
+    "KeySchema": [{"AttributeName": "email", "KeyType": "HASH"}],
+    "Projection": {"ProjectionType": "ALL"},
+}
 
 
 def create_user_table():
+    client = get_dynamodb_client()
 
     try:
-        dynamodb_client.describe_table(TableName=TABLE_NAME)
+        response = client.describe_table(TableName=TABLE_NAME)
         logger.info(f"Table {TABLE_NAME} already exists")
+        indexes = response["Table"].get("GlobalSecondaryIndexes") or []
+        if EMAIL_INDEX not in [index["IndexName"] for index in indexes]:
+            add_email_index(client)
         return
     except ClientError as e:
         if e.response["Error"]["Code"] != "ResourceNotFoundException":
@@ -47,18 +117,20 @@ def create_user_table():
     logger.info(f"Creating table {TABLE_NAME}...")
 
     try:
-        dynamodb_client.create_table(
+        client.create_table(
             TableName=TABLE_NAME,
             KeySchema=[
                 {"AttributeName": "user_id", "KeyType": "HASH"}
             ],  # Partition key
             AttributeDefinitions=[
-                {"AttributeName": "user_id", "AttributeType": "S"}  # String
+                {"AttributeName": "user_id", "AttributeType": "S"},  # String
+                {"AttributeName": "email", "AttributeType": "S"},
             ],
+            GlobalSecondaryIndexes=[EMAIL_INDEX_DEFINITION],
             BillingMode="PAY_PER_REQUEST",
         )
 
-        waiter = dynamodb_client.get_waiter("table_exists")
+        waiter = client.get_waiter("table_exists")
         waiter.wait(TableName=TABLE_NAME)
 
         logger.info(f"Table {TABLE_NAME} created successfully")
@@ -67,9 +139,58 @@ def create_user_table():
         raise
 
 
+def add_email_index(client):
+    # Tables created before the email index existed get it added in place
+    logger.info(f"Adding index {EMAIL_INDEX} to table {TABLE_NAME}...")
+    try:
+        client.update_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=[{"AttributeName": "email", "AttributeType": "S"}],
+            GlobalSecondaryIndexUpdates=[{"Create": EMAIL_INDEX_DEFINITION}],
+        )
+    except ClientError as e:
+        logger.error(f"Error adding index: {e}")
+        raise
+
+
+def create_counter_table():
+    client = get_dynamodb_client()
+
+    try:
+        client.describe_table(TableName=COUNTER_TABLE_NAME)
+        logger.info(f"Table {COUNTER_TABLE_NAME} already exists")
+        return
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ResourceNotFoundException":
+            logger.error(f"Error checking table existence: {e}")
+            raise
+
+    logger.info(f"Creating table {COUNTER_TABLE_NAME}...")
+
+    try:
+        client.create_table(
+            TableName=COUNTER_TABLE_NAME,
+            KeySchema=[{"AttributeName": "counter_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[
+                {"AttributeName": "counter_id", "AttributeType": "S"}
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+        waiter = client.get_waiter("table_exists")
+        waiter.wait(TableName=COUNTER_TABLE_NAME)
+
+        logger.info(f"Table {COUNTER_TABLE_NAME} created successfully")
+    except ClientError as e:
+        logger.error(f"Error creating table: {e}")
+        raise
+
+
 def list_tables():
+    if STORAGE_BACKEND == "memory":
+        return get_dynamodb_resource().tables
     try:
-        response = dynamodb_client.list_tables()
+        response = get_dynamodb_client().list_tables()
         return response["TableNames"]
     except ClientError as e:
         logger.error(f"Error listing tables: {e}")
@@ -77,11 +198,27 @@ def list_tables():
 
 
 def get_user_table():
-    return dynamodb_resource.Table(TABLE_NAME)
+    return get_dynamodb_resource().Table(TABLE_NAME)
+
+
+def get_counter_table():
+    return get_dynamodb_resource().Table(COUNTER_TABLE_NAME)
+
+
+def transact_write_items(**kwargs):
+    # The resource API has no transactions. Its client does, and takes the
+    # same untyped values; the memory engine implements the call itself
+    if STORAGE_BACKEND == "memory":
+        return get_dynamodb_resource().transact_write_items(**kwargs)
+    return get_dynamodb_client().transact_write_items(**kwargs)
 
 
 def create_tables():
+    if STORAGE_BACKEND == "memory":
+        # Memory tables are created on first use
+        return
     if IS_OFFLINE:
         create_user_table()
+        create_counter_table()
         logger.info("All tables created successfully")
     return
@@ -0,0 +1,46 @@
+import csv
+import io
+import os
+
+from .models import UserModel
+from .records import USER_FIELDS, User
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Items per Scan page; one page is the most the export holds in memory
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", 1000))
+
+
+def _csv_value(value, dumps):
+    if value is None or isinstance(value, str):
+        return value
+    # Numbers, sets and maps are written the way the JSON API renders them
+    return dumps(value)
+
+
+def _ndjson_rows(items, dumps):
+    return "".join(dumps(item) + "\n" for item in items)
+
+
+def _csv_rows(items, columns, dumps, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    for item in items:
+        writer.writerow([_csv_value(item.get(column), dumps) for column in columns])
+    return buffer.getvalue()
+
+
+def export_chunks(fmt, dumps, fields=None):
+    # Yields one text chunk per Scan page; the first chunk carries the first
+    # page so errors surface before a response is committed
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    columns = fields or list(USER_FIELDS)
+    pages = UserModel.iter_pages(limit=EXPORT_PAGE_SIZE, fields=fields)
+    for i, (page, _) in enumerate(pages):
+        items = [item.to_dict() if isinstance(item, User) else item for item in page]
+        if fmt == "ndjson":
+            yield _ndjson_rows(items, dumps)
+        else:
+            yield _csv_rows(items, columns, dumps, header=i == 0)
@@ -0,0 +1,149 @@
+import base64
+import importlib
+import re
+import time
+from urllib.parse import unquote
+
+from werkzeug import http
+
+from . import compression, metrics
+from .http_cache import DEFAULT_CACHE_CONTROL, prefers_html
+from .json_provider import response_body
+from .models import UserModel
+from .throttle import CapacityExceeded, retry_after_header
+
+# Lambda entry point: hot JSON routes are answered straight from the API
+# Gateway proxy event with the same status, headers and body Flask would
+# send; everything else goes through serverless-wsgi and Flask
+
+USER_PATH = re.compile(r"^/users/([^/]+)$")
+# GET routes under /users/ that are Flask views rather than user ids
+RESERVED_USER_PATHS = {"new", "count", "export"}
+
+
+def _request(event):
+    # REST API (v1) and HTTP API (v2) proxy events
+    http_context = event.get("requestContext", {}).get("http", {})
+    method = event.get("httpMethod") or http_context.get("method", "")
+    path = event.get("path") or event.get("rawPath", "")
+    headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    query = event.get("queryStringParameters") or {}
+    return method.upper(), path, headers, query
+
+
+def _json(status, obj, headers=None):
+    return {
+        "statusCode": status,
+        "headers": {
+            "Content-Type": "application/json",
+            "Date": http.http_date(),
+            **(headers or {}),
+        },
+        "body": response_body(obj).decode("utf-8"),
+        "isBase64Encoded": False,
+    }
+
+
+def _conditional(response, headers):
+    # Same ETag / If-None-Match handling http_cache gives the Flask routes
+    etag = http.generate_etag(response["body"].encode("utf-8"))
+    response["headers"]["ETag"] = f'"{etag}"'
+    response["headers"]["Cache-Control"] = DEFAULT_CACHE_CONTROL
+    if http.parse_etags(headers.get("if-none-match")).contains_weak(etag):
+        response.update(statusCode=304, body="")
+    return response
+
+
+def _compress(response, headers):
+    # Mirrors compression.compress_response for these JSON bodies
+    if response["statusCode"] == 304:
+        return response
+    vary = [response["headers"].get("Vary"), "Accept-Encoding"]
+    response["headers"]["Vary"] = ", ".join(filter(None, vary))
+    accepted = http.parse_accept_header(headers.get("accept-encoding"))
+    encoding = accepted.best_match(compression.supported_encodings())
+    data = response["body"].encode("utf-8")
+    if encoding is None or len(data) < compression.COMPRESS_MIN_SIZE:
+        return response
+    body = compression.compress(data, encoding)
+    response["headers"]["Content-Encoding"] = encoding
+    if "ETag" in response["headers"]:
+        # Same entity in another encoding: weak ETags still match If-None-Match
+        response["headers"]["ETag"] = "W/" + response["headers"]["ETag"]
+    response.update(body=base64.b64encode(body).decode("ascii"), isBase64Encoded=True)
+    return response
+
+
+def _error(e):
+    if isinstance(e, CapacityExceeded):
+        return _json(429, {"error": str(e)}, {"Retry-After": retry_after_header(e)})
+    if isinstance(e, ValueError):
+        return _json(400, {"error": str(e)})
+    if str(e) == "DoesNotExist":
+        return _json(404, {"error": "User not found"})
+    return _json(500, {"error": str(e)})
+
+
+def health_check(headers, query, user_id=None):
+    return _json(200, {"status": "healthy"})
+
+
+def get_user(headers, query, user_id):
+    fields = [f.strip() for f in (query.get("fields") or "").split(",") if f.strip()]
+    try:
+        user = UserModel.get(user_id, fields=fields or None)
+    except Exception as e:
+        response = _error(e)
+    else:
+        response = _conditional(_json(200, user), headers)
+    # Flask negotiates this URL on Accept, so every response varies on it
+    response["headers"]["Vary"] = "Accept"
+    return response
+
+
+def route(method, path, headers):
+    if method != "GET":
+        return None, None
+    if path == "/health":
+        return health_check, None
+    match = USER_PATH.match(path)
+    # Browsers get the HTML user page, which Flask renders
+    wants_json = not prefers_html(headers.get("accept"))
+    if match and match.group(1) not in RESERVED_USER_PATHS and wants_json:
+        return get_user, unquote(match.group(1))
+    return None, None
+
+
+def wsgi_handler(event, context):
+    # wsgi_handler.py is generated into the package root by the serverless-wsgi
+    # plugin; besides HTTP it serves `sls wsgi` command and warmup events
+    try:
+        entry = importlib.import_module("wsgi_handler")
+    except ImportError:  # running outside a deployment package
+        import serverless_wsgi
+
+        from .app import app
+
+        return serverless_wsgi.handle_request(app, event, context)
+    return entry.handler(event, context)
+
+
+def _is_http(event):
+    return "httpMethod" in event or "http" in event.get("requestContext", {})
+
+
+def handler(event, context):
+    if not _is_http(event):
+        return wsgi_handler(event, context)
+    method, path, headers, query = _request(event)
+    view, user_id = route(method, path, headers)
+    if view is None:
+        return wsgi_handler(event, context)
+    started = time.perf_counter()
+    response = _compress(view(headers, query, user_id), headers)
+    elapsed = time.perf_counter() - started
+    metrics.registry.observe_route(
+        method, view.__name__, response["statusCode"], elapsed
+    )
+    response["headers"]["Server-Timing"] = f"total;dur={elapsed * 1000:.2f}"
+    return response
@@ -0,0 +1,41 @@
+import os
+
+from flask import current_app, request
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+DEFAULT_CACHE_CONTROL = os.environ.get("CACHE_CONTROL", "no-cache")
+
+
+def prefers_html(accept):
+    # Browsers rank text/html first; API clients sending */* or no Accept get JSON
+    offers = ["application/json", "text/html"]
+    return parse_accept_header(accept, MIMEAccept).best_match(offers) == "text/html"
+
+
+def conditional(cache_control=None):
+    # Marks a view for ETag / If-None-Match handling and sets its Cache-Control
+    def decorator(view):
+        view.cache_control = cache_control or DEFAULT_CACHE_CONTROL
+        return view
+
+    return decorator
+
+
+def conditional_response(response):
+    if request.method not in ("GET", "HEAD") or response.status_code != 200:
+        return response
+    view = current_app.view_functions.get(request.endpoint)
+    policy = getattr(view, "cache_control", None)
+    if policy is None:
+        return response
+    response.headers["Cache-Control"] = policy
+    # Streamed bodies can't be hashed without buffering them
+    if not response.is_streamed:
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def init_app(app):
+    app.after_request(conditional_response)
@@ -0,0 +1,66 @@
+import decimal
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+from .records import User
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+INT64_MAX = 2**63 - 1
+
+
+def default(obj):
+    # DynamoDB returns every number as Decimal and SS/NS attributes as sets
+    if isinstance(obj, decimal.Decimal):
+        if obj == obj.to_integral_value() and abs(obj) <= INT64_MAX:
+            return int(obj)
+        return float(obj)
+    if isinstance(obj, User):
+        return obj.to_dict()
+    if isinstance(obj, (set, frozenset)):
+        try:
+            return sorted(obj)
+        except TypeError:
+            return list(obj)
+    return DefaultJSONProvider.default(obj)
+
+
+def response_body(obj):
+    # The bytes JSONProvider.response writes outside debug mode, for callers
+    # that answer without a Flask app (and need matching ETags)
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+    body = json.dumps(obj, default=default, sort_keys=True, separators=(",", ":"))
+    return (body + "\n").encode("utf-8")
+
+
+class JSONProvider(DefaultJSONProvider):
+    default = staticmethod(default)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._orjson_dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._orjson_dumps(obj), mimetype=self.mimetype)
+
+    def _orjson_dumps(self, obj):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            # Stable key order keeps content-hash ETags stable
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
@@ -0,0 +1,247 @@
+import functools
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, has_app_context, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+        lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {self.count}')
+        lines.append(f"{name}_sum{_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {self.count}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = defaultdict(Histogram)
+        self.operations = defaultdict(Histogram)
+        self.operation_errors = defaultdict(int)
+        self.capacity = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.collectors = []
+
+    def observe_route(self, method, route, status, seconds):
+        with self._lock:
+            self.routes[
+                (("method", method), ("route", route), ("status", status))
+            ].observe(seconds)
+
+    def observe_operation(self, operation, seconds, error=False):
+        with self._lock:
+            self.operations[(("operation", operation),)].observe(seconds)
+            if error:
+                self.operation_errors[(("operation", operation),)] += 1
+
+    def observe_call(self, operation, table, capacity):
+        with self._lock:
+            self.calls[(("operation", operation),)] += 1
+            if capacity:
+                self.capacity[(("operation", operation), ("table", table))] += capacity
+
+    def render(self):
+        with self._lock:
+            lines = [
+                "# HELP http_request_duration_seconds Request latency by route",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for labels, histogram in sorted(self.routes.items()):
+                lines.extend(histogram.render("http_request_duration_seconds", labels))
+            lines += [
+                "# HELP user_model_operation_duration_seconds UserModel call latency",
+                "# TYPE user_model_operation_duration_seconds histogram",
+            ]
+            for labels, histogram in sorted(self.operations.items()):
+                lines.extend(
+                    histogram.render("user_model_operation_duration_seconds", labels)
+                )
+            lines += [
+                "# HELP user_model_operation_errors_total UserModel calls that raised",
+                "# TYPE user_model_operation_errors_total counter",
+            ]
+            for labels, value in sorted(self.operation_errors.items()):
+                lines.append(
+                    f"user_model_operation_errors_total{_labels(labels)} {value}"
+                )
+            lines += [
+                "# HELP dynamodb_requests_total DynamoDB API requests",
+                "# TYPE dynamodb_requests_total counter",
+            ]
+            for labels, value in sorted(self.calls.items()):
+                lines.append(f"dynamodb_requests_total{_labels(labels)} {value}")
+            lines += [
+                "# HELP dynamodb_consumed_capacity_units_total Consumed capacity units",
+                "# TYPE dynamodb_consumed_capacity_units_total counter",
+            ]
+            for labels, value in sorted(self.capacity.items()):
+                lines.append(
+                    f"dynamodb_consumed_capacity_units_total{_labels(labels)} {value}"
+                )
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _request_timings():
+    if not has_app_context():
+        # Worker threads of batch/parallel operations only feed the registry
+        return None
+    if "db_timings" not in g:
+        g.db_timings = defaultdict(lambda: [0, 0.0, 0.0])
+    return g.db_timings
+
+
+def instrumented(operation):
+    # Times a UserModel call into the registry and the request's Server-Timing
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                registry.observe_operation(operation, elapsed, error)
+                timings = _request_timings()
+                if timings is not None:
+                    timings[operation][0] += 1
+                    timings[operation][1] += elapsed
+
+        return wrapper
+
+    return decorator
+
+
+def _add_capacity_param(params, model, **kwargs):
+    if "ReturnConsumedCapacity" in model.input_shape.members:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+
+def _start_call(context, **kwargs):
+    context["metrics_started"] = time.perf_counter()
+
+
+def _finish_call(parsed, model, context, **kwargs):
+    elapsed = time.perf_counter() - context.get("metrics_started", time.perf_counter())
+    consumed = parsed.get("ConsumedCapacity") or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    for entry in consumed or [{}]:
+        registry.observe_call(
+            model.name, entry.get("TableName", ""), entry.get("CapacityUnits", 0)
+        )
+    timings = _request_timings()
+    if timings is not None:
+        timing = timings[f"dynamodb_{model.name}"]
+        timing[0] += 1
+        timing[1] += elapsed
+        timing[2] += sum(entry.get("CapacityUnits", 0) for entry in consumed)
+
+
+def register_client_hooks(client):
+    events = client.meta.events
+    events.register("before-parameter-build.dynamodb.*", _add_capacity_param)
+    events.register("before-call.dynamodb.*", _start_call)
+    events.register("after-call.dynamodb.*", _finish_call)
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+
+
+def _after_request(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.endpoint or "unmatched"
+    registry.observe_route(request.method, route, response.status_code, elapsed)
+    entries = []
+    for name, (count, seconds, capacity) in sorted(g.get("db_timings", {}).items()):
+        desc = f"{count} call{'s' if count != 1 else ''}"
+        if capacity:
+            desc += f", {capacity:g} CU"
+        entries.append(f'{name};dur={seconds * 1000:.2f};desc="{desc}"')
+    entries.append(f"total;dur={elapsed * 1000:.2f}")
+    response.headers.add("Server-Timing", ", ".join(entries))
+    return response
+
+
+def cache_collector(name, cache):
+    def collect():
+        stats = cache.stats()
+        return [
+            f"# TYPE {name}_hits_total counter",
+            f"{name}_hits_total {stats['hits']}",
+            f"# TYPE {name}_misses_total counter",
+            f"{name}_misses_total {stats['misses']}",
+            f"# TYPE {name}_evictions_total counter",
+            f"{name}_evictions_total {stats['evictions']}",
+            f"# TYPE {name}_size gauge",
+            f"{name}_size {stats['size']}",
+        ]
+
+    return collect
+
+
+def singleflight_collector(name, flight):
+    def collect():
+        stats = flight.stats()
+        return [
+            f"# TYPE {name}_calls_total counter",
+            f"{name}_calls_total {stats['calls']}",
+            f"# TYPE {name}_collapsed_total counter",
+            f"{name}_collapsed_total {stats['collapsed']}",
+        ]
+
+    return collect
+
+
+def metrics_response():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -1,43 +1,678 @@
+import base64
+import copy
+import json
+import os
+import queue
+import re
+import threading
+from concurrent import futures
+from itertools import islice
+
 from botocore.exceptions import ClientError
 
-from .dynamodb import get_user_table
+from . import counters, dynamodb, throttle
+from .cache import MISS, NOT_FOUND, user_cache
+from .dynamodb import get_dynamodb_resource, get_user_table
+from .metrics import instrumented
+from .records import User, deserialize
+from .singleflight import scan_pages, user_reads
+from .throttle import backoff
+
+SCAN_SEGMENTS = int(os.environ.get("SCAN_SEGMENTS", 4))
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", SCAN_SEGMENTS))
+# Pages buffered between segment workers and the consumer of a parallel scan
+SCAN_QUEUE_PAGES = int(os.environ.get("SCAN_QUEUE_PAGES", 8))
+SCAN_POLL_SECONDS = 0.1
+# Scans decode low-level client items into compact User records
+FAST_PATH = (
+    os.environ.get("USER_FAST_PATH") == "1" and dynamodb.STORAGE_BACKEND == "dynamodb"
+)
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 4))
+BATCH_MAX_RETRIES = int(os.environ.get("BATCH_MAX_RETRIES", 5))
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+MAX_PROJECTION_FIELDS = 20
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,63}$")
+# Set on create and bumped by every write; clients send it back for
+# optimistic locking. Items written before versioning count as version 0
+VERSION_FIELD = "version"
+# Conditional puts retried when a concurrent write moves the version
+WRITE_MAX_ATTEMPTS = 5
+
+
+def encode_cursor(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, sort_keys=True, default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    # Only a table scan key is accepted; anything else would reach DynamoDB
+    # as a malformed ExclusiveStartKey and fail as a 500
+    if not isinstance(key, dict) or set(key) != {"user_id"}:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key["user_id"], str):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def projection_kwargs(fields):
+    if not fields:
+        return {}
+    fields = list(dict.fromkeys(fields))
+    if len(fields) > MAX_PROJECTION_FIELDS:
+        raise ValueError(f"At most {MAX_PROJECTION_FIELDS} fields allowed")
+    for field in fields:
+        if not FIELD_NAME.match(field):
+            raise ValueError(f"Invalid field: {field}")
+    # Placeholders keep reserved words such as "name" legal in the expression
+    names = {f"#f{i}": field for i, field in enumerate(fields)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+def version_condition(expected_version):
+    # Condition for writing over the version a client read
+    names = {"#user_id": "user_id", "#version": VERSION_FIELD}
+    if expected_version == 0:
+        return {
+            "ConditionExpression": "attribute_exists(#user_id)"
+            " AND attribute_not_exists(#version)",
+            "ExpressionAttributeNames": names,
+        }
+    return {
+        "ConditionExpression": "attribute_exists(#user_id) AND #version = :expected",
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": {":expected": expected_version},
+    }
+
+
+def update_kwargs(changes, expected_version=None):
+    if not changes:
+        raise ValueError("No changes given")
+    names = {"#user_id": "user_id", "#version": VERSION_FIELD}
+    values = {":zero": 0, ":one": 1}
+    sets, removes = [], []
+    for i, (field, value) in enumerate(changes.items()):
+        if field in names.values() or not FIELD_NAME.match(field):
+            raise ValueError(f"Invalid field: {field}")
+        names[f"#f{i}"] = field
+        if value is None:
+            removes.append(f"#f{i}")
+        else:
+            values[f":v{i}"] = value
+            sets.append(f"#f{i} = :v{i}")
+    sets.append("#version = if_not_exists(#version, :zero) + :one")
+    expression = "SET " + ", ".join(sets)
+    if removes:
+        expression += " REMOVE " + ", ".join(removes)
+    # Never creates a user; with a version, only updates the one the client read
+    condition = "attribute_exists(#user_id)"
+    if expected_version is not None:
+        checked = version_condition(expected_version)
+        condition = checked["ConditionExpression"]
+        values.update(checked.get("ExpressionAttributeValues", {}))
+    return {
+        "UpdateExpression": expression,
+        "ConditionExpression": condition,
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
+
+
+def _user_write_reason(error):
+    # In a cancelled transaction the user write is always the first entry
+    reasons = error.response.get("CancellationReasons") or [{}]
+    return reasons[0]
+
+
+def condition_failed_item(error):
+    # The item a failed conditional write found, from
+    # ReturnValuesOnConditionCheckFailure=ALL_OLD; None if there was none
+    if error.response["Error"]["Code"] == "TransactionCanceledException":
+        item = _user_write_reason(error).get("Item")
+    else:
+        item = error.response.get("Item")
+    return deserialize({"M": item}) if item else None
+
+
+def is_condition_failure(error):
+    code = error.response["Error"]["Code"]
+    if code == "TransactionCanceledException":
+        return _user_write_reason(error).get("Code") == "ConditionalCheckFailed"
+    return code == "ConditionalCheckFailedException"
+
+
+def is_transaction_conflict(error):
+    # Concurrent transactions on one counter shard; safe to retry
+    reasons = error.response.get("CancellationReasons") or []
+    return any(reason.get("Code") == "TransactionConflict" for reason in reasons)
+
+
+def transact(*items):
+    return throttle.call(
+        "write",
+        dynamodb.transact_write_items,
+        units=2 * len(items),
+        TransactItems=list(items),
+    )
+
+
+def _copy_page(page):
+    # Coalesced scan callers get their own list and items
+    items, last_key = page
+    return [copy.copy(item) for item in items], last_key
+
+
+def project(item, fields):
+    if not fields:
+        return dict(item)
+    return {field: item[field] for field in fields if field in item}
+
+
+def chunked(values, size):
+    iterator = iter(values)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _offer(pages, stop, item):
+    # Blocks while the consumer is behind; gives up once the scan is closed
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=SCAN_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _produce_segment(pages, stop, segment, total_segments, fields):
+    try:
+        for page in UserModel.iter_segment(segment, total_segments, fields):
+            if not _offer(pages, stop, page):
+                return
+    except Exception as e:
+        _offer(pages, stop, e)
+        return
+    _offer(pages, stop, None)
+
+
+def invalidate(user_id):
+    user_cache.invalidate(user_id)
+    user_reads.forget(lambda key: key[0] == user_id)
+    scan_pages.forget(lambda key: True)
 
 
 class UserModel:
     @staticmethod
-    def get(user_id):
+    @instrumented("get")
+    def get(user_id, fields=None):
+        projection = projection_kwargs(fields)
+        cached = user_cache.get(user_id)
+        if cached is NOT_FOUND:
+            raise Exception("DoesNotExist")
+        if cached is not MISS:
+            return project(cached, fields)
+        generation = user_cache.generation(user_id)
         table = get_user_table()
         try:
-            response = table.get_item(Key={"user_id": user_id})
+            # Concurrent reads of one user share a single GetItem
+            response = user_reads.do(
+                (user_id, tuple(fields) if fields else None),
+                lambda: throttle.call(
+                    "read", table.get_item, Key={"user_id": user_id}, **projection
+                ),
+            )
             if "Item" not in response:
+                user_cache.set_missing(user_id, generation)
                 raise Exception("DoesNotExist")
-            return response["Item"]
+            if not fields:
+                # Only complete items are cached so any projection can be served
+                user_cache.set(user_id, response["Item"], generation)
+            return dict(response["Item"])
         except ClientError:
             raise
 
     @staticmethod
+    @instrumented("create")
     def create(user_data):
+        # Overwrites carry the version forward, so a version a client read
+        # earlier can never match again; each put is conditioned on the item
+        # the previous attempt found
+        table = get_user_table()
+        user_id = user_data["user_id"]
+        current = None
+        for attempt in range(WRITE_MAX_ATTEMPTS):
+            if current is None:
+                version = 0
+                condition = {
+                    "ConditionExpression": "attribute_not_exists(#user_id)",
+                    "ExpressionAttributeNames": {"#user_id": "user_id"},
+                }
+            else:
+                version = int(current.get(VERSION_FIELD, 0))
+                condition = version_condition(version)
+            item = dict(user_data, **{VERSION_FIELD: version + 1})
+            put = dict(
+                Item=item, ReturnValuesOnConditionCheckFailure="ALL_OLD", **condition
+            )
+            try:
+                if current is None and counters.USER_COUNT:
+                    # A new user and its count land in one transaction;
+                    # overwrites leave the count unchanged
+                    transact(
+                        {"Put": dict(put, TableName=dynamodb.TABLE_NAME)},
+                        counters.transact_update(1),
+                    )
+                else:
+                    throttle.call("write", table.put_item, **put)
+            except ClientError as e:
+                if is_transaction_conflict(e):
+                    backoff(attempt)
+                    continue
+                if not is_condition_failure(e):
+                    raise
+                current = condition_failed_item(e)
+                continue
+            invalidate(user_id)
+            return item
+        raise Exception("VersionConflict")
+
+    @staticmethod
+    @instrumented("update")
+    def update(user_id, changes, expected_version=None):
+        # changes maps attribute -> new value; None removes the attribute
+        kwargs = update_kwargs(changes, expected_version)
         table = get_user_table()
         try:
-            table.put_item(Item=user_data)
-            return user_data
+            response = throttle.call(
+                "write",
+                table.update_item,
+                Key={"user_id": user_id},
+                ReturnValues="UPDATED_NEW",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+                **kwargs,
+            )
+        except ClientError as e:
+            if not is_condition_failure(e):
+                raise
+            if condition_failed_item(e) is None:
+                raise Exception("DoesNotExist")
+            raise Exception("VersionConflict")
+        invalidate(user_id)
+        return response.get("Attributes", {})
+
+    @staticmethod
+    def scan(fields=None):
+        items = []
+        for page, _ in UserModel.iter_pages(fields=fields):
+            items.extend(page)
+        return items
+
+    @staticmethod
+    @instrumented("scan_page")
+    def scan_page(limit=None, cursor=None, fields=None, paced=False):
+        kwargs = projection_kwargs(fields)
+        if limit:
+            kwargs["Limit"] = limit
+        start_key = decode_cursor(cursor)
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        try:
+            items, last_key = scan_pages.do(
+                (limit, cursor, tuple(fields) if fields else None),
+                lambda: UserModel._scan_call(kwargs, paced),
+                copy=_copy_page,
+            )
+            return items, encode_cursor(last_key)
         except ClientError:
             raise
 
     @staticmethod
-    def scan():
+    def _scan_call(kwargs, paced=False):
+        # One Scan request; returns (items, LastEvaluatedKey) in resource format
+        if not FAST_PATH:
+            response = throttle.call(
+                "read", get_user_table().scan, paced=paced, **kwargs
+            )
+            return response.get("Items", []), response.get("LastEvaluatedKey")
+        request = dict(kwargs, TableName=dynamodb.TABLE_NAME)
+        if "ExclusiveStartKey" in kwargs:
+            start_key = kwargs["ExclusiveStartKey"]["user_id"]
+            request["ExclusiveStartKey"] = {"user_id": {"S": start_key}}
+        client = dynamodb.get_dynamodb_client()
+        response = throttle.call("read", client.scan, paced=paced, **request)
+        records = [User.from_item(item) for item in response.get("Items", [])]
+        last_key = response.get("LastEvaluatedKey")
+        return records, last_key and {"user_id": last_key["user_id"]["S"]}
+
+    @staticmethod
+    def iter_pages(limit=None, cursor=None, fields=None):
+        while True:
+            items, cursor = UserModel.scan_page(
+                limit=limit, cursor=cursor, fields=fields, paced=True
+            )
+            yield items, cursor
+            if not cursor:
+                return
+
+    @staticmethod
+    @instrumented("find_by_email")
+    def find_by_email(email, fields=None):
         table = get_user_table()
+        kwargs = projection_kwargs(fields)
+        names = kwargs.setdefault("ExpressionAttributeNames", {})
+        names["#email"] = "email"
+        kwargs.update(
+            IndexName=dynamodb.EMAIL_INDEX,
+            KeyConditionExpression="#email = :email",
+            ExpressionAttributeValues={":email": email},
+        )
+        items = []
+        try:
+            while True:
+                response = throttle.call("read", table.query, **kwargs)
+                items.extend(response.get("Items", []))
+                if "LastEvaluatedKey" not in response:
+                    return items
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except ClientError:
+            raise
+
+    @staticmethod
+    def iter_segment(segment, total_segments, fields=None):
+        kwargs = projection_kwargs(fields)
+        kwargs.update(Segment=segment, TotalSegments=total_segments)
+        try:
+            while True:
+                page, last_key = UserModel._scan_call(kwargs, paced=True)
+                yield page
+                if not last_key:
+                    return
+                kwargs["ExclusiveStartKey"] = last_key
+        except ClientError:
+            raise
+
+    @staticmethod
+    @instrumented("scan_segment")
+    def scan_segment(segment, total_segments, fields=None):
+        pages = UserModel.iter_segment(segment, total_segments, fields)
+        return [item for page in pages for item in page]
+
+    @staticmethod
+    def iter_parallel_scan(total_segments=None, max_workers=None, fields=None):
+        # Segment workers push pages through a bounded queue, so memory stays
+        # at SCAN_QUEUE_PAGES pages and closing the iterator stops the scan.
+        # Pages are yielded in arrival order, not key order
+        total_segments = total_segments or SCAN_SEGMENTS
+        max_workers = max_workers or SCAN_WORKERS
+        pages = queue.Queue(maxsize=SCAN_QUEUE_PAGES)
+        stop = threading.Event()
+        executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            for segment in range(total_segments):
+                executor.submit(
+                    throttle.bind(_produce_segment),
+                    pages,
+                    stop,
+                    segment,
+                    total_segments,
+                    fields,
+                )
+            remaining = total_segments
+            while remaining:
+                page = pages.get()
+                if page is None:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield from page
+        finally:
+            stop.set()
+            executor.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def parallel_scan(total_segments=None, max_workers=None, fields=None):
+        return list(UserModel.iter_parallel_scan(total_segments, max_workers, fields))
+
+    @staticmethod
+    def _batch_get_chunk(user_ids, fields=None):
+        resource = get_dynamodb_resource()
+        table_name = dynamodb.TABLE_NAME
+        keys = [{"user_id": uid} for uid in user_ids]
+        request = {table_name: {"Keys": keys, **projection_kwargs(fields)}}
+        items = []
         try:
-            response = table.scan()
-            return response.get("Items", [])
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                keys = request[table_name]["Keys"]
+                response = throttle.call(
+                    "read",
+                    resource.batch_get_item,
+                    units=len(keys) / 2,
+                    paced=True,
+                    RequestItems=request,
+                )
+                items.extend(response.get("Responses", {}).get(table_name, []))
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    return items
+                backoff(attempt)
         except ClientError:
             raise
+        raise Exception("UnprocessedKeys")
 
     @staticmethod
+    @instrumented("batch_get")
+    def batch_get(user_ids):
+        unique_ids = list(dict.fromkeys(user_ids))
+        found = {}
+        with futures.ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+            chunks = chunked(unique_ids, BATCH_GET_SIZE)
+            for items in executor.map(
+                throttle.bind(UserModel._batch_get_chunk), chunks
+            ):
+                found.update((item["user_id"], item) for item in items)
+        users = [found[uid] for uid in unique_ids if uid in found]
+        missing = [uid for uid in unique_ids if uid not in found]
+        return users, missing
+
+    @staticmethod
+    def _batch_write_chunk(write_requests):
+        resource = get_dynamodb_resource()
+        request = {dynamodb.TABLE_NAME: write_requests}
+        try:
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                response = throttle.call(
+                    "write",
+                    resource.batch_write_item,
+                    units=len(request[dynamodb.TABLE_NAME]),
+                    paced=True,
+                    RequestItems=request,
+                )
+                request = response.get("UnprocessedItems")
+                if not request:
+                    return
+                backoff(attempt)
+        except ClientError:
+            raise
+        raise Exception("UnprocessedItems")
+
+    @staticmethod
+    def _counted_write_chunk(write_requests, user_ids, inserting):
+        # BatchWriteItem cannot return old items or check conditions, so
+        # existing items are looked up first: to tell inserts from overwrites
+        # for the user count, to carry versions forward on overwrite, and to
+        # report which deleted ids existed. Returns the ids that existed
+        found = UserModel._batch_get_chunk(user_ids, fields=["user_id", VERSION_FIELD])
+        versions = {i["user_id"]: int(i.get(VERSION_FIELD, 0)) for i in found}
+        if inserting:
+            items = [request["PutRequest"]["Item"] for request in write_requests]
+            write_requests = []
+            for item in items:
+                version = versions.get(item["user_id"], 0) + 1
+                item = dict(item, **{VERSION_FIELD: version})
+                write_requests.append({"PutRequest": {"Item": item}})
+        UserModel._batch_write_chunk(write_requests)
+        existing = len(versions)
+        counters.add(len(user_ids) - existing if inserting else -existing)
+        return set(versions)
+
+    @staticmethod
+    def _batch_write(chunks, inserting):
+        # chunks yields (refs, user_ids, write_requests); refs identify
+        # failures. Returns (written, failures, ids that already existed)
+        written = 0
+        failures = []
+        existed = set()
+        in_flight = {}
+
+        def collect(done):
+            nonlocal written
+            for future in done:
+                refs, user_ids = in_flight.pop(future)
+                try:
+                    existed.update(future.result())
+                    written += len(refs)
+                    for user_id in user_ids:
+                        invalidate(user_id)
+                except Exception as e:
+                    failures.extend((ref, str(e)) for ref in refs)
+
+        with futures.ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+            try:
+                for refs, user_ids, write_requests in chunks:
+                    future = executor.submit(
+                        throttle.bind(UserModel._counted_write_chunk),
+                        write_requests,
+                        user_ids,
+                        inserting,
+                    )
+                    in_flight[future] = (refs, user_ids)
+                    if len(in_flight) >= BATCH_WORKERS * 2:
+                        done, _ = futures.wait(
+                            in_flight, return_when=futures.FIRST_COMPLETED
+                        )
+                        collect(done)
+            finally:
+                # Settle chunks already sent even if the source raised, so
+                # their cache entries are still invalidated
+                collect(list(in_flight))
+        return written, failures, existed
+
+    @staticmethod
+    @instrumented("batch_create")
+    def batch_create(records):
+        # records is an iterable of (ref, user_data)
+        def chunks():
+            for chunk in chunked(records, BATCH_WRITE_SIZE):
+                # A single BatchWriteItem call rejects duplicate keys
+                items = {user["user_id"]: user for _, user in chunk}
+                write_requests = [{"PutRequest": {"Item": i}} for i in items.values()]
+                yield [ref for ref, _ in chunk], list(items), write_requests
+
+        written, failures, _ = UserModel._batch_write(chunks(), inserting=True)
+        return written, failures
+
+    @staticmethod
+    @instrumented("batch_delete")
+    def batch_delete(user_ids):
+        # Deleting a missing key is not an error, so ids are checked against
+        # the lookup in _counted_write_chunk; returns (deleted, not_found,
+        # failures), with existence as of that lookup
+        processed = []
+
+        def chunks():
+            for chunk in chunked(user_ids, BATCH_WRITE_SIZE):
+                unique_ids = list(dict.fromkeys(chunk))
+                write_requests = [
+                    {"DeleteRequest": {"Key": {"user_id": uid}}} for uid in unique_ids
+                ]
+                processed.extend(unique_ids)
+                yield unique_ids, unique_ids, write_requests
+
+        _, failures, existed = UserModel._batch_write(chunks(), inserting=False)
+        failed = {ref for ref, _ in failures}
+        not_found = [
+            uid for uid in processed if uid not in existed and uid not in failed
+        ]
+        return len(existed), not_found, failures
+
+    @staticmethod
+    def iter_matching_ids(filters):
+        # Equality filter resolved through a parallel scan of just the needed
+        # attributes; ids are yielded page by page as segments produce them
+        fields = ["user_id", *(f for f in filters if f != "user_id")]
+        for item in UserModel.iter_parallel_scan(fields=fields):
+            if isinstance(item, User):
+                item = item.to_dict()
+            if all(item.get(name) == value for name, value in filters.items()):
+                yield item["user_id"]
+
+    @staticmethod
+    @instrumented("delete")
     def delete(user_id):
+        if counters.USER_COUNT:
+            return UserModel._counted_delete(user_id)
         table = get_user_table()
         try:
-            response = table.delete_item(Key={"user_id": user_id})
+            response = throttle.call(
+                "write",
+                table.delete_item,
+                Key={"user_id": user_id},
+                ReturnValues="ALL_OLD",
+            )
+            invalidate(user_id)
             return response
         except ClientError:
             raise
+
+    @staticmethod
+    def _counted_delete(user_id):
+        # The delete only happens if the user exists, in one transaction with
+        # the count, so deleting a missing user never moves it
+        delete = {
+            "TableName": dynamodb.TABLE_NAME,
+            "Key": {"user_id": user_id},
+            "ConditionExpression": "attribute_exists(#user_id)",
+            "ExpressionAttributeNames": {"#user_id": "user_id"},
+        }
+        for attempt in range(WRITE_MAX_ATTEMPTS):
+            try:
+                response = transact({"Delete": delete}, counters.transact_update(-1))
+            except ClientError as e:
+                if is_transaction_conflict(e):
+                    backoff(attempt)
+                    continue
+                if not is_condition_failure(e):
+                    raise
+                response = {}
+            invalidate(user_id)
+            return response
+        raise Exception("TransactionConflict")
+
+    @staticmethod
+    @instrumented("count")
+    def count():
+        return counters.total()
+
+    @staticmethod
+    def reconcile_count():
+        # Rebuilds the counters from a keys-only parallel scan; writes that
+        # land while it runs can drift the total until the next reconcile
+        count = sum(1 for _ in UserModel.iter_parallel_scan(fields=["user_id"]))
+        counters.reset(count)
+        return count
@@ -0,0 +1,203 @@
+import decimal
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Fraction of user table requests profiled; 0 disables the profiler
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_TOP_K = int(os.environ.get("PROFILE_TOP_K", 20))
+# Seconds between log summaries; 0 turns them off
+PROFILE_LOG_INTERVAL = float(os.environ.get("PROFILE_LOG_INTERVAL", 300))
+# Extra sketch slots per reported key keep the top-K estimates tight
+SKETCH_FACTOR = 5
+SIZE_BUCKETS = (100, 400, 1024, 4096, 16384, 65536, 409600)
+KEY = "user_id"
+
+
+class SpaceSaving:
+    # Bounded top-K counter: at most `capacity` keys are tracked and a new key
+    # takes the slot of the smallest one, inheriting its count as the error
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+
+    def add(self, key, weight=1):
+        entry = self.counts.get(key)
+        if entry is not None:
+            entry[0] += weight
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = [weight, 0]
+            return
+        victim = min(self.counts, key=lambda k: self.counts[k][0])
+        floor = self.counts.pop(victim)[0]
+        self.counts[key] = [floor + weight, floor]
+
+    def top(self, n):
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(key, count, error) for key, (count, error) in ranked[:n]]
+
+
+def item_size(value):
+    # Approximates DynamoDB's item size rules, in bytes
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, decimal.Decimal)):
+        digits = decimal.Decimal(str(value)).as_tuple().digits
+        return len(digits) // 2 + 2
+    if isinstance(value, dict):
+        return 3 + sum(item_size(k) + item_size(v) + 1 for k, v in value.items())
+    return 3 + sum(item_size(v) + 1 for v in value)
+
+
+def _quantile(histogram, q):
+    # Upper bound of the bucket holding the q-th observation
+    rank = q * histogram.count
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return None
+
+
+def _ms(bound):
+    # p50/p95 are bucket upper bounds; None means above the largest bucket
+    return None if bound is None else bound * 1000
+
+
+def _access(operation, kwargs, response):
+    # (read keys, write keys, item sizes) of one resource-API request
+    reads, writes, items = [], [], []
+    if operation == "get_item":
+        reads.append(kwargs["Key"][KEY])
+        items.extend([response["Item"]] if "Item" in response else [])
+    elif operation == "put_item":
+        writes.append(kwargs["Item"][KEY])
+        items.append(kwargs["Item"])
+    elif operation in ("update_item", "delete_item"):
+        writes.append(kwargs["Key"][KEY])
+    elif operation == "batch_get_item":
+        for request in kwargs["RequestItems"].values():
+            reads.extend(key[KEY] for key in request["Keys"])
+        for found in response.get("Responses", {}).values():
+            items.extend(found)
+    elif operation == "batch_write_item":
+        for requests in kwargs["RequestItems"].values():
+            for request in requests:
+                if "PutRequest" in request:
+                    writes.append(request["PutRequest"]["Item"][KEY])
+                    items.append(request["PutRequest"]["Item"])
+                else:
+                    writes.append(request["DeleteRequest"]["Key"][KEY])
+    else:
+        items.extend(response.get("Items", []))
+    return reads, writes, items
+
+
+class Profiler:
+    def __init__(
+        self,
+        sample_rate=PROFILE_SAMPLE_RATE,
+        top_k=PROFILE_TOP_K,
+        log_interval=PROFILE_LOG_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self.sample_rate = sample_rate
+        self.top_k = top_k
+        self.log_interval = log_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.reads = SpaceSaving(self.top_k * SKETCH_FACTOR)
+            self.writes = SpaceSaving(self.top_k * SKETCH_FACTOR)
+            self.latency = defaultdict(Histogram)
+            self.sizes = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+            self.samples = 0
+            self.started = self.last_logged = self.clock()
+
+    def sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate  # nosec
+
+    def observe(self, operation, kwargs, response, seconds):
+        try:
+            reads, writes, items = _access(operation, kwargs, response)
+        except (KeyError, TypeError, AttributeError):
+            # Shapes the profiler does not understand are timed only
+            reads, writes, items = [], [], []
+        self.record(operation, seconds, reads, writes, map(item_size, items))
+
+    def record(self, operation, seconds, reads=(), writes=(), sizes=()):
+        with self._lock:
+            self.samples += 1
+            self.latency[operation].observe(seconds)
+            for key in reads:
+                self.reads.add(key)
+            for key in writes:
+                self.writes.add(key)
+            for size in sizes:
+                self.sizes[operation].observe(size)
+            now = self.clock()
+            due = self.log_interval and now - self.last_logged >= self.log_interval
+            if due:
+                self.last_logged = now
+        if due:
+            # Piggybacks on requests; Lambda has no reliable background timer
+            logger.info(f"Access profile: {json.dumps(self.summary(limit=5))}")
+
+    def _hot(self, sketch, limit):
+        # Sampled counts are scaled back up to estimated request counts
+        return [
+            {
+                KEY: key,
+                "estimated": round(count / self.sample_rate),
+                "error": round(error / self.sample_rate),
+            }
+            for key, count, error in sketch.top(limit)
+        ]
+
+    def summary(self, limit=None):
+        limit = limit or self.top_k
+        with self._lock:
+            operations = {}
+            for operation, histogram in sorted(self.latency.items()):
+                operations[operation] = {
+                    "samples": histogram.count,
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 2),
+                    "p50_ms": _ms(_quantile(histogram, 0.5)),
+                    "p95_ms": _ms(_quantile(histogram, 0.95)),
+                }
+                sizes = self.sizes.get(operation)
+                if sizes and sizes.count:
+                    operations[operation]["item_bytes"] = {
+                        "items": sizes.count,
+                        "mean": round(sizes.sum / sizes.count),
+                        "p95": _quantile(sizes, 0.95),
+                    }
+            return {
+                "enabled": self.sample_rate > 0,
+                "sample_rate": self.sample_rate,
+                "samples": self.samples,
+                "window_seconds": round(self.clock() - self.started, 1),
+                "hot_reads": self._hot(self.reads, limit),
+                "hot_writes": self._hot(self.writes, limit),
+                "operations": operations,
+            }
+
+
+profiler = Profiler()
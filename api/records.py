@@ -0,0 +1,67 @@
+USER_FIELDS = ("user_id", "name", "email")
+
+_deserializer = None
+
+
+def deserialize(typed_value):
+    # Generic fallback for attributes outside the known user schema
+    global _deserializer
+    if _deserializer is None:
+        from boto3.dynamodb.types import TypeDeserializer
+
+        _deserializer = TypeDeserializer()
+    return _deserializer.deserialize(typed_value)
+
+
+def _string(typed_value):
+    if typed_value is None:
+        return None
+    value = typed_value.get("S")
+    return value if value is not None else deserialize(typed_value)
+
+
+class User:
+    __slots__ = ("user_id", "name", "email", "extra")
+
+    def __init__(self, user_id=None, name=None, email=None, extra=None):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.extra = extra
+
+    @classmethod
+    def from_item(cls, item):
+        # Decodes a low-level client item ({"name": {"S": ...}}) without
+        # walking it through TypeDeserializer
+        user_id = item.get("user_id")
+        name = item.get("name")
+        email = item.get("email")
+        record = cls(_string(user_id), _string(name), _string(email))
+        known = (user_id is not None) + (name is not None) + (email is not None)
+        if len(item) > known:
+            record.extra = {
+                key: deserialize(value)
+                for key, value in item.items()
+                if key not in USER_FIELDS
+            }
+        return record
+
+    def to_dict(self):
+        data = {}
+        if self.user_id is not None:
+            data["user_id"] = self.user_id
+        if self.name is not None:
+            data["name"] = self.name
+        if self.email is not None:
+            data["email"] = self.email
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        if not isinstance(other, User):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"User({self.to_dict()!r})"
@@ -0,0 +1,72 @@
+import os
+import threading
+
+COALESCE_READS = os.environ.get("COALESCE_READS", "1") == "1"
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent callers with the same key share one in-flight call and its
+    # result or exception; with a copy function each follower gets
+    # copy(result) instead of the leader's object
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.collapsed = 0
+
+    def do(self, key, func, copy=None):
+        if not self.enabled:
+            return func()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.collapsed += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy(call.result) if copy else call.result
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, match):
+        # Callers arriving after a write start a fresh call instead of
+        # joining one that may have read the old value
+        with self._lock:
+            for key in [key for key in self._calls if match(key)]:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "calls": self.calls,
+                "collapsed": self.collapsed,
+            }
+
+
+user_reads = SingleFlight(COALESCE_READS)
+scan_pages = SingleFlight(COALESCE_READS)
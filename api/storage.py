@@ -0,0 +1,473 @@
+import base64
+import bisect
+import contextlib
+import copy
+import decimal
+import json
+import re
+import sqlite3
+import threading
+import zlib
+
+from botocore.exceptions import ClientError
+
+# In-memory stand-in for the subset of the boto3 DynamoDB resource API that
+# UserModel uses (Table get/put/update/delete/scan/query plus batch
+# get/write), so it can be swapped in under UserModel via STORAGE_BACKEND=memory.
+
+UPDATE_CLAUSE = re.compile(r"\b(SET|REMOVE|ADD|DELETE)\b", re.IGNORECASE)
+CONDITION_AND = re.compile(r"\s+AND\s+", re.IGNORECASE)
+CONDITION_FUNCTION = re.compile(r"^(attribute_exists|attribute_not_exists)\((.+)\)$")
+
+
+def _validation_error(operation, message):
+    return ClientError(
+        {"Error": {"Code": "ValidationException", "Message": message}}, operation
+    )
+
+
+def _typed(item):
+    # Like DynamoDB, old items in errors come back in low-level (typed) form
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+    return {k: serializer.serialize(v) for k, v in item.items()}
+
+
+def _condition_failed(operation, item=None):
+    response = {
+        "Error": {
+            "Code": "ConditionalCheckFailedException",
+            "Message": "The conditional request failed",
+        }
+    }
+    if item is not None:
+        response["Item"] = _typed(item)
+    return ClientError(response, operation)
+
+
+def _encode(value):
+    if isinstance(value, decimal.Decimal):
+        return {"$N": str(value)}
+    if isinstance(value, (set, frozenset)):
+        return {"$S": sorted(value, key=str)}
+    if isinstance(value, (bytes, bytearray)):
+        return {"$B": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Unsupported attribute type: {type(value).__name__}")
+
+
+def _decode(obj):
+    if len(obj) == 1:
+        if "$N" in obj:
+            return decimal.Decimal(obj["$N"])
+        if "$S" in obj:
+            return set(obj["$S"])
+        if "$B" in obj:
+            return base64.b64decode(obj["$B"])
+    return obj
+
+
+def _resolve(token, names):
+    token = token.strip()
+    return names.get(token, token)
+
+
+def _condition_holds(item, expression, names, values):
+    # AND-joined attribute_exists / attribute_not_exists / = / <> clauses
+    for clause in CONDITION_AND.split(expression.strip()):
+        clause = clause.strip()
+        function = CONDITION_FUNCTION.match(clause)
+        if function:
+            exists = _resolve(function.group(2), names) in item
+            if exists != (function.group(1) == "attribute_exists"):
+                return False
+            continue
+        operator = "<>" if "<>" in clause else "="
+        path, _, value = clause.partition(operator)
+        equal = item.get(_resolve(path, names)) == values[value.strip()]
+        if equal != (operator == "="):
+            return False
+    return True
+
+
+def _split_actions(clause):
+    # Commas inside if_not_exists(...) do not separate actions
+    actions, depth, start = [], 0, 0
+    for i, char in enumerate(clause):
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if char == "," and depth == 0:
+            actions.append(clause[start:i].strip())
+            start = i + 1
+    actions.append(clause[start:].strip())
+    return [action for action in actions if action]
+
+
+def _parse_update(expression):
+    parts = UPDATE_CLAUSE.split(expression)
+    if parts[0].strip():
+        raise _validation_error("UpdateItem", f"Invalid UpdateExpression: {expression}")
+    return [
+        (keyword.upper(), _split_actions(clause))
+        for keyword, clause in zip(parts[1::2], parts[2::2])
+    ]
+
+
+class MemoryTable:
+    def __init__(self, name, key="user_id", db=None, db_lock=None):
+        self.name = name
+        self.key = key
+        self._items = {}
+        self._keys = []  # sorted, drives scan order and ExclusiveStartKey
+        self._lock = threading.RLock()
+        self._db = db
+        # Tables share one SQLite connection, so its transactions are
+        # serialized across all of them, not just within this table
+        self._db_lock = db_lock or threading.Lock()
+        if db is not None:
+            self._load()
+
+    def _load(self):
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT key, item FROM items WHERE table_name = ?", (self.name,)
+            ).fetchall()
+        for key, item in rows:
+            self._items[key] = json.loads(item, object_hook=_decode)
+        self._keys = sorted(self._items)
+
+    def _persist(self, key, item):
+        if self._db is None:
+            return
+        with self._db_lock, self._db:
+            if item is None:
+                self._db.execute(
+                    "DELETE FROM items WHERE table_name = ? AND key = ?",
+                    (self.name, key),
+                )
+            else:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO items VALUES (?, ?, ?)",
+                    (self.name, key, json.dumps(item, default=_encode)),
+                )
+
+    def _key_of(self, key, operation):
+        if set(key) != {self.key}:
+            raise _validation_error(
+                operation, "The provided key element does not match the schema"
+            )
+        return self._key_value(key[self.key], operation)
+
+    def _key_value(self, value, operation):
+        # Every table here has a string (S) hash key; anything else would also
+        # break the sorted key list for later inserts and scans
+        if not isinstance(value, str) or not value:
+            raise _validation_error(
+                operation,
+                "One or more parameter values were invalid: "
+                f"Type mismatch for key {self.key} expected: S",
+            )
+        return value
+
+    def _project(self, item, kwargs):
+        expression = kwargs.get("ProjectionExpression")
+        if not expression:
+            return copy.deepcopy(item)
+        names = kwargs.get("ExpressionAttributeNames", {})
+        fields = [_resolve(token, names) for token in expression.split(",")]
+        return {f: copy.deepcopy(item[f]) for f in fields if f in item}
+
+    def _store(self, key, item):
+        if key not in self._items:
+            bisect.insort(self._keys, key)
+        self._items[key] = item
+        self._persist(key, item)
+
+    def _remove(self, key):
+        old = self._items.pop(key, None)
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, key)]
+            self._persist(key, None)
+        return old
+
+    def _condition_ok(self, item, kwargs):
+        expression = kwargs.get("ConditionExpression")
+        return not expression or _condition_holds(
+            item or {},
+            expression,
+            kwargs.get("ExpressionAttributeNames", {}),
+            kwargs.get("ExpressionAttributeValues", {}),
+        )
+
+    def _check_condition(self, item, kwargs, operation):
+        if not self._condition_ok(item, kwargs):
+            wants_old = kwargs.get("ReturnValuesOnConditionCheckFailure") == "ALL_OLD"
+            raise _condition_failed(operation, item if wants_old else None)
+
+    def get_item(self, Key, **kwargs):
+        with self._lock:
+            item = self._items.get(self._key_of(Key, "GetItem"))
+            return {} if item is None else {"Item": self._project(item, kwargs)}
+
+    def put_item(self, Item, ReturnValues="NONE", **kwargs):
+        if self.key not in Item:
+            raise _validation_error(
+                "PutItem", f"Missing the key {self.key} in the item"
+            )
+        key = self._key_value(Item[self.key], "PutItem")
+        with self._lock:
+            old = self._items.get(key)
+            self._check_condition(old, kwargs, "PutItem")
+            self._store(key, copy.deepcopy(Item))
+        return {"Attributes": old} if ReturnValues == "ALL_OLD" and old else {}
+
+    def _operand(self, item, token, names, values):
+        token = token.strip()
+        if token.startswith(":"):
+            return copy.deepcopy(values[token])
+        if token.startswith("if_not_exists(") and token.endswith(")"):
+            path, default = token[len("if_not_exists(") : -1].split(",", 1)
+            current = item.get(_resolve(path, names))
+            if current is None:
+                return copy.deepcopy(values[default.strip()])
+            return copy.deepcopy(current)
+        name = _resolve(token, names)
+        if name not in item:
+            raise _validation_error(
+                "UpdateItem", f"The expression refers to a missing attribute: {name}"
+            )
+        return copy.deepcopy(item[name])
+
+    def _value(self, item, expression, names, values):
+        # A SET value is an operand, optionally followed by + or - operand
+        depth = 0
+        for i, char in enumerate(expression):
+            depth += {"(": 1, ")": -1}.get(char, 0)
+            if char in "+-" and depth == 0:
+                left = self._operand(item, expression[:i], names, values)
+                right = self._operand(item, expression[i + 1 :], names, values)
+                return left + right if char == "+" else left - right
+        return self._operand(item, expression, names, values)
+
+    def _apply_update(self, item, expression, names, values):
+        updated = set()
+        for keyword, actions in _parse_update(expression):
+            for action in actions:
+                if keyword == "SET":
+                    path, value = action.split("=", 1)
+                else:
+                    path, _, value = action.partition(" ")
+                name = _resolve(path, names)
+                if name == self.key:
+                    raise _validation_error(
+                        "UpdateItem", f"Cannot update attribute {name}, part of the key"
+                    )
+                current = item.get(name)
+                if keyword == "SET":
+                    item[name] = self._value(item, value, names, values)
+                elif keyword == "REMOVE":
+                    item.pop(name, None)
+                elif keyword == "ADD":
+                    value = values[value.strip()]
+                    if current is None:
+                        item[name] = copy.deepcopy(value)
+                    elif isinstance(current, (set, frozenset)):
+                        item[name] = current | value
+                    else:
+                        item[name] = current + value
+                elif current is not None:
+                    # DELETE removes elements from a set; empty sets vanish
+                    remaining = current - values[value.strip()]
+                    if remaining:
+                        item[name] = remaining
+                    else:
+                        del item[name]
+                updated.add(name)
+        return updated
+
+    def update_item(self, Key, UpdateExpression, ReturnValues="NONE", **kwargs):
+        names = kwargs.get("ExpressionAttributeNames", {})
+        values = kwargs.get("ExpressionAttributeValues", {})
+        with self._lock:
+            key = self._key_of(Key, "UpdateItem")
+            old = self._items.get(key)
+            self._check_condition(old, kwargs, "UpdateItem")
+            item = copy.deepcopy(old) if old is not None else dict(Key)
+            updated = self._apply_update(item, UpdateExpression, names, values)
+            self._store(key, item)
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": copy.deepcopy(item)}
+        if ReturnValues == "ALL_OLD":
+            return {"Attributes": old} if old else {}
+        if ReturnValues in ("UPDATED_NEW", "UPDATED_OLD"):
+            source = item if ReturnValues == "UPDATED_NEW" else (old or {})
+            attributes = {n: copy.deepcopy(source[n]) for n in updated if n in source}
+            return {"Attributes": attributes} if attributes else {}
+        return {}
+
+    def delete_item(self, Key, ReturnValues="NONE", **kwargs):
+        with self._lock:
+            key = self._key_of(Key, "DeleteItem")
+            self._check_condition(self._items.get(key), kwargs, "DeleteItem")
+            old = self._remove(key)
+        return {"Attributes": old} if ReturnValues == "ALL_OLD" and old else {}
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, **kwargs):
+        total = kwargs.get("TotalSegments")
+        segment = kwargs.get("Segment")
+        with self._lock:
+            start = 0
+            if ExclusiveStartKey:
+                start_key = self._key_of(ExclusiveStartKey, "Scan")
+                start = bisect.bisect_right(self._keys, start_key)
+            items = []
+            last_key = None
+            for key in self._keys[start:]:
+                if total and zlib.crc32(key.encode("utf-8")) % total != segment:
+                    continue
+                items.append(self._project(self._items[key], kwargs))
+                if Limit and len(items) == Limit:
+                    last_key = key
+                    break
+            response = {"Items": items, "Count": len(items)}
+            # Like DynamoDB, a full last page may still carry LastEvaluatedKey
+            if last_key is not None:
+                response["LastEvaluatedKey"] = {self.key: last_key}
+            return response
+
+    def query(
+        self, KeyConditionExpression, Limit=None, ExclusiveStartKey=None, **kwargs
+    ):
+        names = kwargs.get("ExpressionAttributeNames", {})
+        values = kwargs.get("ExpressionAttributeValues", {})
+        conditions = []
+        for clause in KeyConditionExpression.split(" AND "):
+            if "=" not in clause:
+                raise _validation_error("Query", f"Unsupported key condition: {clause}")
+            name, placeholder = clause.split("=", 1)
+            conditions.append((_resolve(name, names), values[placeholder.strip()]))
+        with self._lock:
+            start = 0
+            if ExclusiveStartKey:
+                start_key = self._key_of(ExclusiveStartKey, "Query")
+                start = bisect.bisect_right(self._keys, start_key)
+            items = []
+            last_key = None
+            for key in self._keys[start:]:
+                item = self._items[key]
+                if all(item.get(name) == value for name, value in conditions):
+                    items.append(self._project(item, kwargs))
+                    if Limit and len(items) == Limit:
+                        last_key = key
+                        break
+            response = {"Items": items, "Count": len(items)}
+            if last_key is not None:
+                response["LastEvaluatedKey"] = {self.key: last_key}
+            return response
+
+
+class MemoryResource:
+    def __init__(self, path=None, keys=None):
+        # keys maps table names to their hash key; user_id by default
+        self._keys = keys or {}
+        self._tables = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS items ("
+                    "table_name TEXT, key TEXT, item TEXT, PRIMARY KEY (table_name, key))"
+                )
+
+    @property
+    def tables(self):
+        return list(self._tables)
+
+    def Table(self, name):
+        with self._lock:
+            if name not in self._tables:
+                key = self._keys.get(name, "user_id")
+                self._tables[name] = MemoryTable(
+                    name, key=key, db=self._db, db_lock=self._db_lock
+                )
+            return self._tables[name]
+
+    def batch_get_item(self, RequestItems):
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            projection = {k: v for k, v in request.items() if k != "Keys"}
+            found = []
+            for key in request["Keys"]:
+                item = table.get_item(Key=key, **projection).get("Item")
+                if item is not None:
+                    found.append(item)
+            responses[name] = found
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def batch_write_item(self, RequestItems):
+        for name, requests in RequestItems.items():
+            table = self.Table(name)
+            for request in requests:
+                if "PutRequest" in request:
+                    table.put_item(Item=request["PutRequest"]["Item"])
+                else:
+                    table.delete_item(Key=request["DeleteRequest"]["Key"])
+        return {"UnprocessedItems": {}}
+
+    def transact_write_items(self, TransactItems):
+        # All-or-nothing: every condition is checked while holding the locks
+        # of all tables involved, and nothing is written unless all hold
+        entries = []
+        for entry in TransactItems:
+            ((action, args),) = entry.items()
+            entries.append((action, self.Table(args["TableName"]), args))
+        tables = sorted({table for _, table, _ in entries}, key=lambda t: t.name)
+        with contextlib.ExitStack() as stack:
+            for table in tables:
+                stack.enter_context(table._lock)
+            reasons = []
+            for action, table, args in entries:
+                if action == "Put":
+                    key = table._key_value(args["Item"].get(table.key), action)
+                else:
+                    key = table._key_of(args["Key"], action)
+                old = table._items.get(key)
+                if table._condition_ok(old, args):
+                    reasons.append({"Code": "None"})
+                    continue
+                reason = {
+                    "Code": "ConditionalCheckFailed",
+                    "Message": "The conditional request failed",
+                }
+                wants_old = args.get("ReturnValuesOnConditionCheckFailure")
+                if wants_old == "ALL_OLD" and old is not None:
+                    reason["Item"] = _typed(old)
+                reasons.append(reason)
+            if any(reason["Code"] != "None" for reason in reasons):
+                codes = ", ".join(reason["Code"] for reason in reasons)
+                raise ClientError(
+                    {
+                        "Error": {
+                            "Code": "TransactionCanceledException",
+                            "Message": f"Transaction cancelled [{codes}]",
+                        },
+                        "CancellationReasons": reasons,
+                    },
+                    "TransactWriteItems",
+                )
+            for action, table, args in entries:
+                args = {
+                    k: v
+                    for k, v in args.items()
+                    if k not in ("TableName", "ConditionExpression")
+                }
+                if action == "Put":
+                    table.put_item(**args)
+                elif action == "Update":
+                    table.update_item(**args)
+                elif action == "Delete":
+                    table.delete_item(**args)
+        return {}
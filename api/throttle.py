@@ -0,0 +1,170 @@
+import contextvars
+import functools
+import math
+import os
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from .profiler import profiler
+
+# Provisioned capacity of the user table; 0 disables client-side limiting
+READ_CAPACITY_UNITS = float(os.environ.get("READ_CAPACITY_UNITS", 0))
+WRITE_CAPACITY_UNITS = float(os.environ.get("WRITE_CAPACITY_UNITS", 0))
+# Seconds of unused capacity a bucket may bank for bursts
+BURST_SECONDS = float(os.environ.get("RATE_LIMIT_BURST_SECONDS", 5))
+# Longest a request waits for capacity before it is rejected with a 429
+MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", 0.5))
+# Longest paced (bulk/scan) calls may wait in total while serving one HTTP
+# request, so they 429 before Lambda or API Gateway time the request out.
+# Outside a request (CLI, background jobs) pacing is unbounded
+REQUEST_MAX_WAIT = float(os.environ.get("RATE_LIMIT_REQUEST_MAX_WAIT", 3))
+THROTTLE_ERRORS = {
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "ThrottlingException",
+}
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 2.0
+
+
+class CapacityExceeded(Exception):
+    def __init__(self, retry_after=1.0):
+        super().__init__("CapacityExceeded")
+        self.retry_after = retry_after
+
+
+def backoff(attempt):
+    # Full jitter keeps concurrent retries from hammering the table in lockstep
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt)
+    time.sleep(random.uniform(0, delay))  # nosec B311
+
+
+class TokenBucket:
+    def __init__(self, rate, burst_seconds=BURST_SECONDS, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = max(rate * burst_seconds, 1.0)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self, units, wait=None):
+        # Debits units up front and returns how long the caller must sleep
+        # before using them; the balance may go negative so a request larger
+        # than the bucket is paced rather than starved
+        with self._lock:
+            self._refill()
+            delay = max(0.0, units - self.tokens) / self.rate
+            if wait is not None and delay > wait:
+                raise CapacityExceeded(delay)
+            self.tokens -= units
+            return delay
+
+    def acquire(self, units=1.0, wait=None):
+        delay = self.reserve(units, wait)
+        if delay:
+            time.sleep(delay)
+
+    def charge(self, units):
+        # Settles the difference between the estimate and consumed capacity
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens - units)
+
+
+def _bucket(rate):
+    return TokenBucket(rate) if rate > 0 else None
+
+
+buckets = {"read": _bucket(READ_CAPACITY_UNITS), "write": _bucket(WRITE_CAPACITY_UNITS)}
+
+
+def configure(read_units=0, write_units=0):
+    buckets["read"] = _bucket(read_units)
+    buckets["write"] = _bucket(write_units)
+
+
+def consumed_units(response):
+    consumed = response.get("ConsumedCapacity")
+    if not consumed:
+        return None
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(entry.get("CapacityUnits", 0) for entry in consumed)
+
+
+_deadline = contextvars.ContextVar("throttle_deadline", default=None)
+
+
+def bind(func):
+    # Pool threads start without the caller's context; this carries the
+    # request deadline into them
+    deadline = _deadline.get()
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        token = _deadline.set(deadline)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _deadline.reset(token)
+
+    return run
+
+
+def _paced_wait():
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def call(kind, func, units=1.0, paced=False, **kwargs):
+    # Runs one DynamoDB request under the read or write budget. Interactive
+    # calls give up after MAX_WAIT; paced (bulk/scan) calls wait their turn,
+    # up to the request deadline when serving HTTP.
+    bucket = buckets.get(kind)
+    wait = _paced_wait() if paced else MAX_WAIT
+    if bucket is not None:
+        bucket.acquire(units, wait)
+    sampled = profiler.sampled()
+    started = time.perf_counter()
+    try:
+        response = func(**kwargs)
+    except ClientError as e:
+        # botocore has already retried throttling up to DYNAMODB_MAX_ATTEMPTS
+        if e.response["Error"]["Code"] in THROTTLE_ERRORS:
+            raise CapacityExceeded(BACKOFF_CAP) from e
+        raise
+    if sampled:
+        elapsed = time.perf_counter() - started
+        profiler.observe(func.__name__, kwargs, response, elapsed)
+    if bucket is not None:
+        consumed = consumed_units(response)
+        if consumed is not None:
+            bucket.charge(consumed - units)
+    return response
+
+
+def retry_after_header(error):
+    return str(max(1, math.ceil(error.retry_after)))
+
+
+def _start_deadline():
+    _deadline.set(time.monotonic() + REQUEST_MAX_WAIT)
+
+
+def _end_deadline(_):
+    _deadline.set(None)
+
+
+def init_app(app):
+    app.before_request(_start_deadline)
+    app.teardown_request(_end_deadline)
@@ -2,6 +2,7 @@ import logging
 
 from flask import Blueprint, redirect, render_template, request, url_for
 
+from .http_cache import conditional
 from .models import UserModel
 
 logger = logging.getLogger(__name__)
@@ -9,12 +10,32 @@ logger = logging.getLogger(__name__)
 
 bp = Blueprint("views", __name__, template_folder="templates")
 
+# Columns and rows per page rendered by index.html
+INDEX_FIELDS = ["user_id", "name", "email"]
+INDEX_PAGE_SIZE = 100
+
+
+def _user_count():
+    # The page still renders if the counter table is unavailable
+    try:
+        return UserModel.count()
+    except Exception as e:
+        logger.warning(f"Error loading user count: {e}")
+        return None
+
 
 @bp.route("/")
+@conditional()
 def index():
     try:
-        users = UserModel.scan()
-        return render_template("index.html", users=users)
+        users, next_cursor = UserModel.scan_page(
+            limit=INDEX_PAGE_SIZE,
+            cursor=request.args.get("cursor"),
+            fields=INDEX_FIELDS,
+        )
+        return render_template(
+            "index.html", users=users, next_cursor=next_cursor, total=_user_count()
+        )
     except Exception as e:
         logger.error(f"Error loading index page: {e}")
         return render_template("error.html", error=str(e))
@@ -38,8 +59,8 @@ def new_user():
     return render_template("new_user.html")
 
 
-@bp.route("/users/<user_id>")
 def view_user(user_id):
+    # HTML side of GET /users/<user_id>; the app's get_user negotiates on Accept
     try:
         user = UserModel.get(user_id)
         return render_template("view_user.html", user=user)
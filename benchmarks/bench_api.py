@@ -0,0 +1,161 @@
+"""Latency and throughput of the API routes and data layer.
+
+Runs api.app.app through Flask's test client against the in-memory storage
+backend (default) or a real endpoint such as the dynamodb-local container
+(--endpoint http://localhost:8000). For each table size it seeds the table
+and measures get_user, create_user, list_users, views.index and the raw
+UserModel calls, then writes p50/p95/p99 latencies and throughput as JSON.
+
+    python benchmarks/bench_api.py --sizes 100 1000 --iterations 200 \\
+        --output bench_output.json
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(sorted_values, pct):
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def measure(name, operation, iterations, warmup=5):
+    for i in range(warmup):
+        operation(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        operation(i)
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "name": name,
+        "iterations": iterations,
+        "throughput_per_s": round(iterations / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def seed(UserModel, size):
+    for i in range(size):
+        UserModel.create(
+            {
+                "user_id": f"user{i:08d}",
+                "name": f"User {i}",
+                "email": f"user{i}@example.com",
+            }
+        )
+
+
+def check(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(
+            f"Unexpected status {response.status_code}: {response.data[:200]}"
+        )
+
+
+def run_size(size, iterations, list_iterations):
+    from api.app import app
+    from api.models import UserModel
+
+    seed(UserModel, size)
+    client = app.test_client()
+    new_user = {"name": "Bench User", "email": "bench@example.com"}
+
+    html = {"Accept": "text/html,*/*;q=0.8"}
+
+    results = [
+        measure(
+            "get_user",
+            lambda i: check(client.get(f"/users/user{i % size:08d}")),
+            iterations,
+        ),
+        measure(
+            "view_user",
+            lambda i: check(client.get(f"/users/user{i % size:08d}", headers=html)),
+            iterations,
+        ),
+        measure(
+            "create_user",
+            lambda i: check(
+                client.post("/users", json=dict(new_user, user_id=f"bench{i:08d}")), 201
+            ),
+            iterations,
+        ),
+        measure("list_users", lambda i: check(client.get("/users")), list_iterations),
+        measure(
+            "list_users_page",
+            lambda i: check(client.get("/users?limit=100")),
+            iterations,
+        ),
+        measure("views.index", lambda i: check(client.get("/")), list_iterations),
+        measure(
+            "UserModel.get",
+            lambda i: UserModel.get(f"user{i % size:08d}"),
+            iterations,
+        ),
+        measure("UserModel.scan", lambda i: UserModel.scan(), list_iterations),
+    ]
+    for i in range(iterations + 5):
+        UserModel.delete(f"bench{i:08d}")
+    for i in range(size):
+        UserModel.delete(f"user{i:08d}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--list-iterations", type=int, default=20)
+    parser.add_argument("--endpoint", help="DynamoDB endpoint instead of the fake")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    # Keep stray print/log output from skewing timings
+    os.environ.setdefault("LOGGING_LEVEL", "WARNING")
+    if args.endpoint:
+        os.environ.update(IS_OFFLINE="1", DYNAMODB_HOST=args.endpoint)
+
+    import api.dynamodb as dynamodb
+
+    if args.endpoint:
+        dynamodb.create_tables()
+        backend = contextlib.nullcontext()
+    else:
+        resource = dynamodb.memory_resource()
+        backend = patch.object(dynamodb, "dynamodb_resource", resource)
+
+    report = {
+        "backend": args.endpoint or "memory",
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": [],
+    }
+    for size in args.sizes:
+        with backend:
+            results = run_size(size, args.iterations, args.list_iterations)
+        report["results"].append({"table_size": size, "routes": results})
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Invocation latency of the native Lambda handler against serverless-wsgi.
+
+Feeds API Gateway proxy events for /health and /users/<user_id> to
+api.handler.handler (fast path) and to api.handler.wsgi_handler (the full
+serverless-wsgi + Flask path the function used before), on the in-memory
+storage backend, and prints p50/p95/p99 latencies as JSON. Events send
+Accept: */* like curl, so both paths return the same JSON response. Needs the
+serverless-wsgi package, which the deploy plugin otherwise bundles.
+
+    python benchmarks/bench_handler.py --iterations 2000 --output handler.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_api import measure  # noqa: E402
+
+
+def make_event(path, accept="*/*"):
+    return {
+        "httpMethod": "GET",
+        "path": path,
+        "resource": "/{proxy+}",
+        "headers": {"Accept": accept, "Host": "example.execute-api.aws"},
+        "multiValueHeaders": {"Accept": [accept]},
+        "queryStringParameters": None,
+        "multiValueQueryStringParameters": None,
+        "pathParameters": {"proxy": path.lstrip("/")},
+        "requestContext": {"stage": "dev", "path": f"/dev{path}"},
+        "body": None,
+        "isBase64Encoded": False,
+    }
+
+
+def check(response):
+    # Both paths must answer with the same JSON; see tests/test_handler.py
+    headers = response.get("headers") or {
+        name: values[0] for name, values in response["multiValueHeaders"].items()
+    }
+    if response["statusCode"] != 200 or headers["Content-Type"] != "application/json":
+        raise RuntimeError(f"Unexpected response: {response}")
+
+
+def run(iterations):
+    from api import dynamodb, handler
+    from api.models import UserModel
+
+    with patch.object(dynamodb, "dynamodb_resource", dynamodb.memory_resource()):
+        UserModel.create(
+            {"user_id": "bench", "name": "Bench", "email": "bench@example.com"}
+        )
+        results = []
+        for name, path in (("health", "/health"), ("get_user", "/users/bench")):
+            event = make_event(path)
+            for label, entry in (
+                ("native", handler.handler),
+                ("wsgi", handler.wsgi_handler),
+            ):
+                results.append(
+                    measure(
+                        f"{name}.{label}",
+                        lambda i, entry=entry: check(entry(dict(event), None)),
+                        iterations,
+                    )
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOGGING_LEVEL", "WARNING")
+    results = run(args.iterations)
+    for native, wsgi in zip(results[::2], results[1::2]):
+        native["speedup_p50"] = round(wsgi["p50_ms"] / native["p50_ms"], 2)
+    report = {
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
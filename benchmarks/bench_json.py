@@ -0,0 +1,98 @@
+"""Compare JSON serialization time for large user list responses.
+
+Times Flask's default provider against api.json_provider.JSONProvider,
+with orjson (when installed) and with the stdlib fallback, on DynamoDB
+shaped items (Decimal numbers, string sets).
+
+    python benchmarks/bench_json.py --sizes 100 1000 10000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import json_provider  # noqa: E402
+
+
+def make_users(count):
+    return [
+        {
+            "user_id": f"user{i:08d}",
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "age": Decimal(20 + i % 50),
+            "score": Decimal("%d.%02d" % (i % 100, i % 97)),
+            "tags": {"admin", "beta"} if i % 3 else {"beta"},
+        }
+        for i in range(count)
+    ]
+
+
+def best_time(app, users, repeat):
+    timings = []
+    with app.app_context():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            app.json.response(users).get_data()
+            timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def build_app(provider_class):
+    app = Flask(__name__)
+    app.json = provider_class(app)
+    return app
+
+
+class SetAwareDefaultProvider(DefaultJSONProvider):
+    # Flask's default provider cannot serialize sets at all
+    default = staticmethod(
+        lambda obj: (
+            list(obj) if isinstance(obj, set) else DefaultJSONProvider.default(obj)
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        users = make_users(size)
+        row = {"items": size}
+        row["flask_default_ms"] = best_time(
+            build_app(SetAwareDefaultProvider), users, args.repeat
+        )
+        with patch.object(json_provider, "orjson", None):
+            row["stdlib_provider_ms"] = best_time(
+                build_app(json_provider.JSONProvider), users, args.repeat
+            )
+        if json_provider.orjson is not None:
+            row["orjson_provider_ms"] = best_time(
+                build_app(json_provider.JSONProvider), users, args.repeat
+            )
+        results.append(
+            {k: round(v, 3) if isinstance(v, float) else v for k, v in row.items()}
+        )
+
+    print(
+        json.dumps(
+            {"orjson": json_provider.orjson is not None, "results": results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
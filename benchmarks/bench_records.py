@@ -0,0 +1,81 @@
+"""Compare decoding scanned items: resource TypeDeserializer vs User records.
+
+The resource path deserializes every attribute of every low-level item into
+a dict (what Table.scan does); the fast path decodes the known user schema
+straight into api.records.User. Reports CPU time and retained memory.
+
+    python benchmarks/bench_records.py --items 10000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from boto3.dynamodb.types import TypeDeserializer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.records import User  # noqa: E402
+
+
+def make_items(count):
+    return [
+        {
+            "user_id": {"S": f"user{i:08d}"},
+            "name": {"S": f"User {i}"},
+            "email": {"S": f"user{i}@example.com"},
+        }
+        for i in range(count)
+    ]
+
+
+def resource_decode(items):
+    deserializer = TypeDeserializer()
+    return [
+        {key: deserializer.deserialize(value) for key, value in item.items()}
+        for item in items
+    ]
+
+
+def record_decode(items):
+    return [User.from_item(item) for item in items]
+
+
+def measure(decode, items, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(items)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = decode(items)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        "best_ms": round(min(timings) * 1000, 3),
+        "per_item_us": round(min(timings) / len(items) * 1e6, 3),
+        "retained_kib": round(retained / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    result = {
+        "items": args.items,
+        "resource_path": measure(resource_decode, items, args.repeat),
+        "record_path": measure(record_decode, items, args.repeat),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure cold-start cost: importing the app and serving the first request.
+
+Each sample runs in a fresh interpreter so nothing is cached between runs.
+Prints a JSON summary and exits non-zero when the median exceeds --max-ms.
+
+    python benchmarks/bench_startup.py --runs 10 --max-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess  # nosec B404
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = """
+import json, time
+start = time.perf_counter()
+from api.app import app
+imported = time.perf_counter()
+response = app.test_client().get("/health")
+assert response.status_code == 200
+done = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000,
+                  "first_request_ms": (done - imported) * 1000,
+                  "boto3_loaded": __import__("sys").modules.get("boto3") is not None}))
+"""
+
+
+def run_sample():
+    output = subprocess.check_output(  # nosec B603
+        [sys.executable, "-c", SAMPLE], cwd=ROOT, env=os.environ.copy()
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def summarize(values):
+    return {
+        "median": round(statistics.median(values), 2),
+        "min": round(min(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    samples = [run_sample() for _ in range(args.runs)]
+    import_ms = [s["import_ms"] for s in samples]
+    total_ms = [s["import_ms"] + s["first_request_ms"] for s in samples]
+    result = {
+        "runs": args.runs,
+        "import_ms": summarize(import_ms),
+        "first_request_ms": summarize([s["first_request_ms"] for s in samples]),
+        "total_ms": summarize(total_ms),
+        "boto3_loaded_at_startup": any(s["boto3_loaded"] for s in samples),
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.max_ms is not None and result["total_ms"]["median"] > args.max_ms:
+        print(f"Cold start median exceeds {args.max_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
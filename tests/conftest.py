@@ -5,7 +5,10 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
-from api.app import app as flask_app
+# Anything not mocked runs against the in-memory engine instead of DynamoDB
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from api.app import app as flask_app  # noqa: E402
 
 
 @pytest.fixture(autouse=True, scope="session")
@@ -33,7 +36,7 @@ def client():
 def setup_dynamodb_mock():
     with patch("api.dynamodb.dynamodb_client") as mock_client, patch(
         "api.dynamodb.dynamodb_resource"
-    ) as mock_resource:
+    ) as mock_resource, patch("api.dynamodb.STORAGE_BACKEND", "dynamodb"):
 
         mock_table = MagicMock()
         mock_resource.Table.return_value = mock_table
@@ -0,0 +1,17 @@
+# Helpers shared by the unittest-style test modules
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_user(i):
+    return {
+        "user_id": f"user{i:03d}",
+        "name": f"User {i}",
+        "email": f"u{i}@example.com",
+    }
@@ -1,8 +1,11 @@
+import base64
 import json
 import unittest
+from decimal import Decimal
 from unittest.mock import patch
 
 from api.app import app
+from api.throttle import CapacityExceeded
 
 
 class TestHealthCheckEndpoint:
@@ -13,6 +16,47 @@ class TestHealthCheckEndpoint:
         assert data == {"status": "healthy"}
 
 
+class TestAdminEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        patcher = patch("api.app.IS_OFFLINE", "1")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("api.app.profiler")
+    def test_profile(self, mock_profiler):
+        mock_profiler.summary.return_value = {"samples": 3}
+        response = self.app.get("/admin/profile?limit=5")
+
+        mock_profiler.summary.assert_called_once_with(limit=5)
+        self.assertEqual(json.loads(response.data), {"samples": 3})
+
+    @patch("api.app.profiler")
+    def test_profile_reset(self, mock_profiler):
+        response = self.app.delete("/admin/profile")
+
+        mock_profiler.reset.assert_called_once_with()
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_invalid_limit(self):
+        response = self.app.get("/admin/profile?limit=0")
+        self.assertEqual(response.status_code, 400)
+
+    @patch("api.app.ADMIN_TOKEN", "secret")
+    def test_profile_requires_token(self):
+        self.assertEqual(self.app.get("/admin/profile").status_code, 401)
+        response = self.app.get(
+            "/admin/profile", headers={"Authorization": "Bearer secret"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @patch("api.app.IS_OFFLINE", None)
+    @patch("api.app.ADMIN_TOKEN", None)
+    def test_profile_denied_without_token_when_deployed(self):
+        self.assertEqual(self.app.get("/admin/profile").status_code, 401)
+        self.assertEqual(self.app.delete("/admin/profile").status_code, 401)
+
+
 class TestUserEndpoints(unittest.TestCase):
     def setUp(self):
         self.app = app.test_client()
@@ -26,7 +70,7 @@ class TestUserEndpoints(unittest.TestCase):
     @patch("api.models.UserModel.create")
     def test_create_user_success(self, mock_create):
         """Test creating a user successfully"""
-        mock_create.return_value = self.mock_user
+        mock_create.return_value = dict(self.mock_user, version=1)
         response = self.app.post(
             "/users", data=json.dumps(self.mock_user), content_type="application/json"
         )
@@ -36,6 +80,7 @@ class TestUserEndpoints(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(data["message"], "User created")
         self.assertEqual(data["user_id"], "test123")
+        self.assertEqual(data["version"], 1)
 
     @patch("api.models.UserModel.create")
     def test_create_user_failure(self, mock_create):
@@ -49,10 +94,21 @@ class TestUserEndpoints(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(data["error"], "Database error")
 
-    @patch("api.models.UserModel.scan")
+    @patch("api.models.UserModel.create")
+    def test_create_user_capacity_exceeded(self, mock_create):
+        """Test an exhausted capacity budget is reported as 429"""
+        mock_create.side_effect = CapacityExceeded(retry_after=1.2)
+        response = self.app.post(
+            "/users", data=json.dumps(self.mock_user), content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "2")
+
+    @patch("api.models.UserModel.scan_page")
     def test_list_users_success(self, mock_scan):
         """Test listing all users successfully"""
-        mock_scan.return_value = [self.mock_user]
+        mock_scan.return_value = ([self.mock_user], None)
         response = self.app.get("/users")
 
         mock_scan.assert_called_once()
@@ -60,17 +116,17 @@ class TestUserEndpoints(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(data, [self.mock_user])
 
-    @patch("api.models.UserModel.scan")
+    @patch("api.models.UserModel.scan_page")
     def test_list_users_empty(self, mock_scan):
         """Test listing users when no users exist"""
-        mock_scan.return_value = []
+        mock_scan.return_value = ([], None)
         response = self.app.get("/users")
 
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         self.assertEqual(data, [])
 
-    @patch("api.models.UserModel.scan")
+    @patch("api.models.UserModel.scan_page")
     def test_list_users_error(self, mock_scan):
         """Test handling errors when listing users"""
         mock_scan.side_effect = Exception("Database error")
@@ -80,6 +136,407 @@ class TestUserEndpoints(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(data["error"], "Database error")
 
+    @patch("api.models.UserModel.iter_parallel_scan")
+    def test_list_users_parallel(self, mock_parallel_scan):
+        """Test listing all users with a segmented parallel scan"""
+        mock_parallel_scan.return_value = iter([self.mock_user])
+        response = self.app.get("/users?parallel=1")
+
+        mock_parallel_scan.assert_called_once()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), [self.mock_user])
+
+    @patch("api.models.UserModel.scan_page")
+    def test_list_users_etag(self, mock_scan):
+        """Test conditional GET returns 304 while the list is unchanged"""
+        mock_scan.return_value = ([self.mock_user], None)
+        response = self.app.get("/users")
+        etag = response.headers["ETag"]
+
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+        cached = self.app.get("/users", headers={"If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.data, b"")
+
+        mock_scan.return_value = (
+            [self.mock_user, dict(self.mock_user, user_id="x")],
+            None,
+        )
+        changed = self.app.get("/users", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+
+    @patch("api.models.UserModel.scan_page")
+    def test_list_users_error_has_no_etag(self, mock_scan):
+        """Test error responses are never marked cacheable"""
+        mock_scan.side_effect = Exception("Database error")
+        response = self.app.get("/users")
+
+        self.assertNotIn("ETag", response.headers)
+        self.assertNotIn("Cache-Control", response.headers)
+
+    @patch("api.models.UserModel.scan_page")
+    def test_list_users_paginated(self, mock_scan_page):
+        """Test listing a single page of users with a cursor"""
+        mock_scan_page.return_value = ([self.mock_user], "next-page")
+        response = self.app.get("/users?limit=1&cursor=abc")
+
+        mock_scan_page.assert_called_once_with(limit=1, cursor="abc", fields=None)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data, {"items": [self.mock_user], "next_cursor": "next-page"})
+
+    @patch("api.models.UserModel.get")
+    def test_get_user(self, mock_get):
+        """Test API clients get JSON whatever Accept they send"""
+        mock_get.return_value = self.mock_user
+        for accept in (None, "*/*", "application/json"):
+            with self.subTest(accept=accept):
+                headers = {"Accept": accept} if accept else {}
+                response = self.app.get("/users/test123", headers=headers)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.mimetype, "application/json")
+                self.assertEqual(response.get_json(), self.mock_user)
+                self.assertIn("Accept", response.vary)
+
+    @patch("api.models.UserModel.get")
+    def test_get_user_html_for_browsers(self, mock_get):
+        """Test browsers get the HTML user page from the same URL"""
+        mock_get.return_value = self.mock_user
+        response = self.app.get(
+            "/users/test123",
+            headers={"Accept": "text/html,application/xhtml+xml,*/*;q=0.8"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/html")
+        self.assertIn("Accept", response.vary)
+
+    @patch("api.models.UserModel.get")
+    def test_get_user_with_fields(self, mock_get):
+        """Test fetching a sparse fieldset of a user"""
+        mock_get.return_value = {"user_id": "test123", "name": "Test User"}
+        response = self.app.get("/users/test123?fields=user_id,%20name")
+
+        mock_get.assert_called_once_with("test123", fields=["user_id", "name"])
+        self.assertEqual(response.get_json(), mock_get.return_value)
+
+    def test_get_user_invalid_fields(self):
+        """Test rejecting field names that are not plain attributes"""
+        response = self.app.get("/users/test123?fields=name,bad.path")
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch("api.models.UserModel.get")
+    def test_get_user_not_found(self, mock_get):
+        """Test fetching a user that does not exist"""
+        mock_get.side_effect = Exception("DoesNotExist")
+        response = self.app.get("/users/missing")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json(), {"error": "User not found"})
+
+    @patch("api.models.UserModel.get")
+    def test_get_user_not_modified(self, mock_get):
+        """Test conditional GET of a user returns 304 while it is unchanged"""
+        mock_get.return_value = self.mock_user
+        etag = self.app.get("/users/test123").headers["ETag"]
+
+        response = self.app.get("/users/test123", headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    @patch("api.models.UserModel.scan_page")
+    def test_list_users_with_fields(self, mock_scan):
+        """Test listing a sparse fieldset of all users"""
+        mock_scan.return_value = ([{"user_id": "test123"}], None)
+        response = self.app.get("/users?fields=user_id")
+
+        mock_scan.assert_called_once_with(limit=None, cursor=None, fields=["user_id"])
+        self.assertEqual(json.loads(response.data), [{"user_id": "test123"}])
+
+    @patch("api.models.UserModel.find_by_email")
+    def test_list_users_by_email(self, mock_find_by_email):
+        """Test looking users up by email through the index"""
+        mock_find_by_email.return_value = [self.mock_user]
+        response = self.app.get("/users?email=test@example.com")
+
+        mock_find_by_email.assert_called_once_with("test@example.com", fields=None)
+        self.assertEqual(json.loads(response.data), [self.mock_user])
+
+    def test_list_users_invalid_limit(self):
+        """Test rejecting a non-positive page size"""
+        response = self.app.get("/users?limit=0")
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch("api.models.UserModel.scan_page")
+    def test_list_users_stream(self, mock_scan_page):
+        """Test streaming all pages as one JSON array"""
+        other_user = dict(self.mock_user, user_id="test456")
+        mock_scan_page.side_effect = [
+            ([self.mock_user], "page-2"),
+            ([other_user], None),
+        ]
+        response = self.app.get("/users?stream=1&limit=1")
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data, [self.mock_user, other_user])
+        self.assertEqual(mock_scan_page.call_count, 2)
+
+    def test_list_users_malformed_cursor(self):
+        """Test a cursor that is not a user_id scan key is a 400"""
+        cursor = base64.urlsafe_b64encode(b'{"user_id": [1]}').decode()
+        response = self.app.get(f"/users?limit=1&cursor={cursor}")
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch("api.app.MAX_RESPONSE_BYTES", 100)
+    @patch("api.models.UserModel.scan_page")
+    def test_list_users_stream_over_cap(self, mock_scan_page):
+        """Test a full-table stream past the response cap is a 413"""
+        mock_scan_page.side_effect = [
+            ([self.mock_user], "page-2"),
+            ([self.mock_user], None),
+        ]
+        response = self.app.get("/users?stream=1&limit=1")
+
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("cursor", json.loads(response.data)["error"])
+
+    @patch("api.app.MAX_RESPONSE_BYTES", 100)
+    @patch("api.models.UserModel.scan_page")
+    def test_list_users_over_cap(self, mock_scan):
+        """Test an unpaginated list stops scanning once past the cap"""
+        mock_scan.return_value = ([self.mock_user], "next-page")
+        response = self.app.get("/users")
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(mock_scan.call_count, 2)
+
+    @patch("api.app.MAX_RESPONSE_BYTES", 100)
+    @patch("api.models.UserModel.iter_parallel_scan")
+    def test_list_users_parallel_over_cap(self, mock_parallel_scan):
+        """Test a parallel scan past the response cap is a 413"""
+        mock_parallel_scan.return_value = iter([self.mock_user] * 3)
+        response = self.app.get("/users?parallel=1")
+
+        self.assertEqual(response.status_code, 413)
+
+    @patch("api.models.UserModel.count")
+    def test_count_users(self, mock_count):
+        """Test reading the maintained user count"""
+        mock_count.return_value = 42
+        response = self.app.get("/users/count")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"count": 42})
+
+    @patch("api.models.UserModel.batch_get")
+    def test_batch_get_users(self, mock_batch_get):
+        """Test looking up several users in one request"""
+        mock_batch_get.return_value = ([self.mock_user], ["missing1"])
+        response = self.app.post(
+            "/users/batch-get",
+            data=json.dumps({"user_ids": ["test123", "missing1"]}),
+            content_type="application/json",
+        )
+
+        mock_batch_get.assert_called_once_with(["test123", "missing1"])
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data, {"items": [self.mock_user], "missing": ["missing1"]})
+
+    def test_batch_get_users_invalid_body(self):
+        """Test rejecting a batch lookup without a list of ids"""
+        response = self.app.post(
+            "/users/batch-get",
+            data=json.dumps({"user_ids": "test123"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch("api.models.UserModel.batch_delete")
+    def test_batch_delete_users(self, mock_batch_delete):
+        """Test deleting a list of users in one request"""
+        mock_batch_delete.return_value = (
+            1,
+            ["missing"],
+            [("bad", "UnprocessedItems")],
+        )
+        response = self.app.post(
+            "/users/batch-delete",
+            data=json.dumps({"user_ids": ["test123", "missing", "bad"]}),
+            content_type="application/json",
+        )
+
+        mock_batch_delete.assert_called_once_with(["test123", "missing", "bad"])
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data["deleted"], 1)
+        self.assertEqual(data["not_found"], ["missing"])
+        self.assertEqual(data["failed"], 1)
+        self.assertEqual(
+            data["errors"], [{"user_id": "bad", "error": "UnprocessedItems"}]
+        )
+
+    @patch("api.models.UserModel.batch_delete")
+    @patch("api.models.UserModel.iter_matching_ids")
+    def test_batch_delete_users_by_filter(self, mock_matching, mock_batch_delete):
+        """Test deleting the users matched by a filter"""
+        mock_matching.return_value = iter(["test123"])
+        mock_batch_delete.side_effect = lambda user_ids: (len(list(user_ids)), [], [])
+        response = self.app.post(
+            "/users/batch-delete",
+            data=json.dumps({"filter": {"email": "test@example.com"}}),
+            content_type="application/json",
+        )
+
+        mock_matching.assert_called_once_with({"email": "test@example.com"})
+        self.assertEqual(json.loads(response.data)["deleted"], 1)
+
+    @patch("api.models.UserModel.batch_delete")
+    @patch("api.models.UserModel.iter_matching_ids")
+    def test_batch_delete_users_by_float_filter(self, mock_matching, _):
+        """Test float filter values are compared as Decimals"""
+        mock_matching.return_value = iter([])
+        self.app.post(
+            "/users/batch-delete",
+            data=json.dumps({"filter": {"score": 1.5}}),
+            content_type="application/json",
+        )
+
+        mock_matching.assert_called_once_with({"score": Decimal("1.5")})
+
+    def test_batch_delete_users_requires_ids_or_filter(self):
+        """Test rejecting a bulk delete without a selection"""
+        for body in ({}, {"filter": {}}, {"user_ids": ["a"], "filter": {"a": "b"}}):
+            response = self.app.post(
+                "/users/batch-delete",
+                data=json.dumps(body),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400)
+
+    @patch("api.models.UserModel.batch_create")
+    def test_import_users_ndjson(self, mock_batch_create):
+        """Test bulk importing NDJSON and reporting bad lines"""
+        mock_batch_create.side_effect = lambda records: (len(list(records)), [])
+        body = "\n".join(
+            [json.dumps(self.mock_user), "{not json", "", json.dumps({"user_id": "x"})]
+        )
+        response = self.app.post(
+            "/users/import", data=body, content_type="application/x-ndjson"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data["written"], 1)
+        self.assertEqual(data["failed"], 2)
+        self.assertEqual([error["line"] for error in data["errors"]], [2, 4])
+
+    @patch("api.models.UserModel.batch_create")
+    def test_import_users_csv(self, mock_batch_create):
+        """Test bulk importing CSV rows"""
+        imported = []
+
+        def batch_create(records):
+            imported.extend(records)
+            return len(imported), [(3, "UnprocessedItems")]
+
+        mock_batch_create.side_effect = batch_create
+        body = "user_id,name,email\ntest123,Test User,test@example.com\n"
+        response = self.app.post("/users/import", data=body, content_type="text/csv")
+
+        self.assertEqual(imported, [(2, self.mock_user)])
+        data = json.loads(response.data)
+        self.assertEqual(data["errors"], [{"line": 3, "error": "UnprocessedItems"}])
+
+    @patch("api.models.UserModel.batch_create")
+    def test_import_users_reports_bad_lines_mid_body(self, mock_batch_create):
+        """Test invalid UTF-8 and wrong types fail only their own lines"""
+        mock_batch_create.side_effect = lambda records: (len(list(records)), [])
+        lines = [json.dumps(self.mock_user).encode()] * 3
+        lines[1] = b'{"user_id": "\xff"}'
+        lines.append(json.dumps(dict(self.mock_user, user_id=5)).encode())
+        response = self.app.post(
+            "/users/import",
+            data=b"\n".join(lines),
+            content_type="application/x-ndjson",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data["written"], 2)
+        self.assertEqual(
+            data["errors"],
+            [
+                {"line": 2, "error": "Invalid UTF-8"},
+                {"line": 4, "error": "Fields must be strings: user_id"},
+            ],
+        )
+
+    @patch("api.models.UserModel.batch_create")
+    def test_import_users_csv_bad_line(self, mock_batch_create):
+        """Test a CSV row with invalid UTF-8 is reported and skipped"""
+        imported = []
+        mock_batch_create.side_effect = lambda records: (
+            imported.extend(records) or len(imported),
+            [],
+        )
+        body = (
+            b"user_id,name,email\nbad,\xff,x@example.com\n"
+            b"test123,Test User,test@example.com\n"
+        )
+        response = self.app.post("/users/import", data=body, content_type="text/csv")
+
+        self.assertEqual(imported, [(3, self.mock_user)])
+        data = json.loads(response.data)
+        self.assertEqual(data["errors"], [{"line": 2, "error": "Invalid UTF-8"}])
+
+    @patch("api.models.UserModel.update")
+    def test_update_user(self, mock_update):
+        mock_update.return_value = {"name": "New", "score": 1.5, "version": 4}
+        response = self.app.patch(
+            "/users/test123", json={"name": "New", "score": 1.5, "version": 3}
+        )
+
+        mock_update.assert_called_once_with(
+            "test123", {"name": "New", "score": Decimal("1.5")}, expected_version=3
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data["attributes"]["version"], 4)
+
+    @patch("api.models.UserModel.update")
+    def test_update_user_errors(self, mock_update):
+        cases = [
+            (Exception("DoesNotExist"), 404),
+            (Exception("VersionConflict"), 409),
+            (ValueError("Invalid field: bad field"), 400),
+            (Exception("Database error"), 500),
+        ]
+        for error, status in cases:
+            with self.subTest(status=status):
+                mock_update.side_effect = error
+                response = self.app.patch("/users/test123", json={"name": "New"})
+                self.assertEqual(response.status_code, status)
+
+    def test_update_user_invalid_body(self):
+        for body in (
+            [],
+            {"name": ""},
+            {"email": None},
+            {"tags": ["a"]},
+            {"version": "1"},
+        ):
+            with self.subTest(body=body):
+                response = self.app.patch("/users/test123", json=body)
+                self.assertEqual(response.status_code, 400)
+
     @patch("api.models.UserModel.delete")
     def test_delete_user_success(self, mock_delete):
         """Test deleting a user successfully"""
@@ -100,3 +557,79 @@ class TestUserEndpoints(unittest.TestCase):
         self.assertEqual(response.status_code, 500)
         data = json.loads(response.data)
         self.assertEqual(data["error"], "Database error")
+
+
+class TestAsyncUserEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.mock_user = {
+            "user_id": "test123",
+            "name": "Test User",
+            "email": "test@example.com",
+        }
+
+    @patch("api.app.AsyncUserModel.get")
+    def test_get_user(self, mock_get):
+        mock_get.return_value = self.mock_user
+        response = self.app.get("/async/users/test123")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), self.mock_user)
+
+    @patch("api.app.AsyncUserModel.get")
+    def test_get_user_not_found(self, mock_get):
+        mock_get.side_effect = Exception("DoesNotExist")
+        response = self.app.get("/async/users/nonexistent")
+
+        self.assertEqual(response.status_code, 404)
+
+    @patch("api.app.AsyncUserModel.create")
+    def test_create_user(self, mock_create):
+        mock_create.return_value = dict(self.mock_user, version=1)
+        response = self.app.post(
+            "/async/users",
+            data=json.dumps(self.mock_user),
+            content_type="application/json",
+        )
+
+        mock_create.assert_called_once_with(self.mock_user)
+        self.assertEqual(response.status_code, 201)
+
+    @patch("api.models.UserModel.scan_page")
+    def test_list_users(self, mock_scan_page):
+        other_user = dict(self.mock_user, user_id="test456")
+        mock_scan_page.side_effect = [
+            ([self.mock_user], "page-2"),
+            ([other_user], None),
+        ]
+        response = self.app.get("/async/users")
+
+        self.assertEqual(json.loads(response.data), [self.mock_user, other_user])
+
+    @patch("api.app.MAX_RESPONSE_BYTES", 100)
+    @patch("api.models.UserModel.scan_page")
+    def test_list_users_over_cap(self, mock_scan_page):
+        mock_scan_page.return_value = ([self.mock_user], "next-page")
+        response = self.app.get("/async/users")
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(mock_scan_page.call_count, 2)
+
+    @patch("api.app.AsyncUserModel.batch_get")
+    def test_batch_get_users(self, mock_batch_get):
+        mock_batch_get.return_value = ([self.mock_user], [])
+        response = self.app.post(
+            "/async/users/batch-get",
+            data=json.dumps({"user_ids": ["test123"]}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)["items"], [self.mock_user])
+
+    @patch("api.app.AsyncUserModel.delete")
+    def test_delete_user(self, mock_delete):
+        response = self.app.delete("/async/users/test123")
+
+        mock_delete.assert_called_once_with("test123")
+        self.assertEqual(response.status_code, 200)
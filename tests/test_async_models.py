@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from api.async_models import AsyncUserModel
+
+
+class TestAsyncUserModel(unittest.TestCase):
+    def setUp(self):
+        self.mock_user = {
+            "user_id": "test123",
+            "name": "Test User",
+            "email": "test@example.com",
+        }
+
+    @patch("api.async_models.UserModel.get")
+    def test_get_user(self, mock_get):
+        mock_get.return_value = self.mock_user
+
+        result = asyncio.run(AsyncUserModel.get("test123"))
+
+        mock_get.assert_called_once_with("test123")
+        self.assertEqual(result, self.mock_user)
+
+    @patch("api.async_models.UserModel.get")
+    def test_get_user_not_found(self, mock_get):
+        mock_get.side_effect = Exception("DoesNotExist")
+
+        with self.assertRaises(Exception) as context:
+            asyncio.run(AsyncUserModel.get("nonexistent"))
+
+        self.assertEqual(str(context.exception), "DoesNotExist")
+
+    @patch("api.async_models.UserModel.scan_segment")
+    def test_scan_runs_segments_concurrently(self, mock_scan_segment):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def scan_segment(segment, total_segments):
+            # Fails with BrokenBarrierError unless all segments are in flight together
+            barrier.wait()
+            return [{"user_id": f"user{segment}"}]
+
+        mock_scan_segment.side_effect = scan_segment
+
+        result = asyncio.run(AsyncUserModel.scan(total_segments=3))
+
+        self.assertEqual(
+            sorted(item["user_id"] for item in result), ["user0", "user1", "user2"]
+        )
+
+    @patch("api.async_models.UserModel._batch_get_chunk")
+    def test_batch_get_keeps_request_order(self, mock_chunk):
+        other_user = dict(self.mock_user, user_id="test456")
+        mock_chunk.return_value = [other_user, self.mock_user]
+
+        users, missing = asyncio.run(
+            AsyncUserModel.batch_get(["test123", "nope", "test456", "test123"])
+        )
+
+        self.assertEqual(users, [self.mock_user, other_user])
+        self.assertEqual(missing, ["nope"])
+        mock_chunk.assert_called_once_with(["test123", "nope", "test456"])
@@ -0,0 +1,138 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from api.cache import MISS, NOT_FOUND, TTLCache
+from api.models import UserModel
+from tests.helpers import FakeClock
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(maxsize=2, ttl=10, negative_ttl=1, clock=self.clock)
+
+    def test_hit_and_miss_counters(self):
+        self.assertIs(self.cache.get("a"), MISS)
+        self.cache.set("a", {"user_id": "a"})
+
+        self.assertEqual(self.cache.get("a"), {"user_id": "a"})
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_entries_expire(self):
+        self.cache.set("a", 1)
+        self.cache.set_missing("b")
+        self.clock.now = 5
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIs(self.cache.get("b"), MISS)
+
+        self.clock.now = 11
+        self.assertIs(self.cache.get("a"), MISS)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+
+        self.assertIs(self.cache.get("b"), MISS)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_fill_read_before_invalidate_is_dropped(self):
+        generation = self.cache.generation("a")
+        self.cache.invalidate("a")
+
+        self.cache.set("a", 1, generation)
+        self.cache.set_missing("a", generation)
+        self.assertIs(self.cache.get("a"), MISS)
+
+        self.cache.set("a", 2, self.cache.generation("a"))
+        self.assertEqual(self.cache.get("a"), 2)
+
+    def test_forgotten_generations_still_reject_stale_fills(self):
+        generation = self.cache.generation("a")
+        for key in ("a", "b", "c"):
+            self.cache.invalidate(key)
+
+        self.cache.set("a", 1, generation)
+        self.assertIs(self.cache.get("a"), MISS)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = TTLCache(maxsize=0, ttl=10)
+        cache.set("a", 1)
+
+        self.assertIs(cache.get("a"), MISS)
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+class TestUserModelCache(unittest.TestCase):
+    def setUp(self):
+        self.mock_user = {
+            "user_id": "test123",
+            "name": "Test User",
+            "email": "test@example.com",
+        }
+        self.mock_table = MagicMock()
+        self.cache = TTLCache(maxsize=10, ttl=60)
+        patcher = patch("api.models.user_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("api.models.get_user_table")
+    def test_get_is_served_from_cache(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        self.mock_table.get_item.return_value = {"Item": self.mock_user}
+
+        UserModel.get("test123")
+        result = UserModel.get("test123")
+
+        self.assertEqual(result, self.mock_user)
+        self.mock_table.get_item.assert_called_once()
+
+    @patch("api.models.get_user_table")
+    def test_missing_user_is_negatively_cached(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        self.mock_table.get_item.return_value = {}
+
+        for _ in range(2):
+            with self.assertRaises(Exception) as context:
+                UserModel.get("nonexistent")
+            self.assertEqual(str(context.exception), "DoesNotExist")
+
+        self.mock_table.get_item.assert_called_once()
+        self.assertIs(self.cache.get("nonexistent"), NOT_FOUND)
+
+    @patch("api.models.get_user_table")
+    def test_writes_invalidate_cache(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        self.cache.set("test123", self.mock_user)
+
+        UserModel.create(dict(self.mock_user, name="Renamed"))
+        self.assertIs(self.cache.get("test123"), MISS)
+
+        self.cache.set("test123", self.mock_user)
+        UserModel.delete("test123")
+        self.assertIs(self.cache.get("test123"), MISS)
+
+    @patch("api.models.get_user_table")
+    def test_write_during_fill_is_not_overwritten(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        reading, written = threading.Event(), threading.Event()
+
+        def slow_get_item(**kwargs):
+            reading.set()
+            written.wait(5)
+            return {"Item": self.mock_user}
+
+        self.mock_table.get_item.side_effect = slow_get_item
+        reader = threading.Thread(target=UserModel.get, args=("test123",))
+        reader.start()
+        reading.wait(5)
+        UserModel.delete("test123")
+        written.set()
+        reader.join(5)
+
+        self.assertIs(self.cache.get("test123"), MISS)
@@ -0,0 +1,93 @@
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+
+from flask import Flask, Response
+
+from api import compression, http_cache
+from api.http_cache import conditional
+
+
+def create_app():
+    app = Flask(__name__)
+    compression.init_app(app)
+    http_cache.init_app(app)
+
+    @app.route("/big")
+    @conditional()
+    def big():
+        return {
+            "users": [{"user_id": f"user{i}", "name": "Test User"} for i in range(200)]
+        }
+
+    @app.route("/small")
+    def small():
+        return {"status": "healthy"}
+
+    @app.route("/stream")
+    def stream():
+        chunks = (json.dumps({"n": i}) + "\n" for i in range(5000))
+        return Response(chunks, mimetype="application/x-ndjson")
+
+    return app
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    def test_gzip_when_accepted(self):
+        response = self.client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        body = json.loads(gzip.decompress(response.data))
+        self.assertEqual(len(body["users"]), 200)
+
+    def test_identity_without_accept_encoding(self):
+        response = self.client.get("/big")
+
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(len(response.get_json()["users"]), 200)
+
+    def test_small_body_is_not_compressed(self):
+        response = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_rejected_encoding_is_not_used(self):
+        response = self.client.get("/big", headers={"Accept-Encoding": "gzip;q=0"})
+
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_streamed_response_is_compressed(self):
+        response = self.client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        lines = gzip.decompress(response.data).decode().splitlines()
+        self.assertEqual(len(lines), 5000)
+        self.assertEqual(json.loads(lines[-1]), {"n": 4999})
+
+    def test_compressed_etag_still_revalidates(self):
+        headers = {"Accept-Encoding": "gzip"}
+        response = self.client.get("/big", headers=headers)
+        etag = response.headers["ETag"]
+
+        self.assertTrue(etag.startswith("W/"))
+        headers["If-None-Match"] = etag
+        self.assertEqual(self.client.get("/big", headers=headers).status_code, 304)
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli_preferred_when_available(self):
+        response = self.client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+
+        self.assertEqual(response.headers["Content-Encoding"], "br")
+        body = json.loads(compression.brotli.decompress(response.data))
+        self.assertEqual(len(body["users"]), 200)
+
+    @patch("api.compression.brotli", None)
+    def test_gzip_fallback_without_brotli(self):
+        response = self.client.get("/big", headers={"Accept-Encoding": "br, gzip"})
+
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
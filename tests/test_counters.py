@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+from api import counters, dynamodb
+from api.models import UserModel
+from tests.helpers import make_user
+
+
+class TestCounters(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("api.dynamodb.dynamodb_resource", dynamodb.memory_resource())
+        self.resource = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_increments_are_spread_over_shards(self):
+        for shard in (0, 3, 3):
+            with patch("api.counters.random.randrange", return_value=shard):
+                counters.add(1)
+        counters.add(0)
+
+        table = dynamodb.get_counter_table()
+        self.assertEqual(
+            table.get_item(Key={"counter_id": "users#3"})["Item"]["total"], 2
+        )
+        self.assertEqual(counters.total(), 3)
+
+    def test_reset(self):
+        counters.add(5)
+
+        counters.reset(2)
+
+        self.assertEqual(counters.total(), 2)
+
+    @patch("api.dynamodb.get_counter_table")
+    def test_failed_update_is_logged(self, mock_get_table):
+        mock_get_table.return_value.update_item.side_effect = ClientError(
+            {"Error": {"Code": "ResourceNotFoundException"}}, "UpdateItem"
+        )
+
+        with self.assertLogs("api.counters", level="WARNING"):
+            counters.add(1)
+
+
+class TestUserModelCount(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("api.dynamodb.dynamodb_resource", dynamodb.memory_resource())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_inserts_and_deletes_are_counted(self):
+        UserModel.create(make_user(1))
+        UserModel.create(make_user(2))
+        UserModel.create(dict(make_user(1), name="Overwrite"))
+        self.assertEqual(UserModel.count(), 2)
+
+        UserModel.delete("user002")
+        UserModel.delete("missing")
+        self.assertEqual(UserModel.count(), 1)
+
+    def test_batch_writes_are_counted(self):
+        UserModel.create(make_user(0))
+
+        UserModel.batch_create((i, make_user(i)) for i in range(30))
+        self.assertEqual(UserModel.count(), 30)
+
+        deleted, not_found, _ = UserModel.batch_delete(
+            ["user000", "user001", "missing"]
+        )
+        self.assertEqual((deleted, not_found), (2, ["missing"]))
+        self.assertEqual(UserModel.count(), 28)
+
+    def test_reconcile_rebuilds_count(self):
+        UserModel.batch_create((i, make_user(i)) for i in range(5))
+        counters.add(10)
+
+        self.assertEqual(UserModel.reconcile_count(), 5)
+        self.assertEqual(UserModel.count(), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
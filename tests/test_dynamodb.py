@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call, patch
 
 from botocore.exceptions import ClientError
 
@@ -13,7 +13,10 @@ class TestDynamoDBIntegration:
 
         create_tables()
 
-        mock_client.describe_table.assert_called_once_with(TableName="user_table")
+        assert mock_client.describe_table.call_args_list == [
+            call(TableName="user_table"),
+            call(TableName="user_counters"),
+        ]
         mock_client.create_table.assert_not_called()
 
     def test_create_tables_new(self, setup_dynamodb_mock):
@@ -29,9 +32,38 @@ class TestDynamoDBIntegration:
 
         create_tables()
 
-        mock_client.describe_table.assert_called_once_with(TableName="user_table")
-        mock_client.create_table.assert_called_once()
-        mock_waiter.wait.assert_called_once_with(TableName="user_table")
+        mock_client.describe_table.assert_any_call(TableName="user_table")
+        user_table, counter_table = mock_client.create_table.call_args_list
+        indexes = user_table.kwargs["GlobalSecondaryIndexes"]
+        assert indexes[0]["IndexName"] == "email-index"
+        assert counter_table.kwargs["KeySchema"][0]["AttributeName"] == "counter_id"
+        assert mock_waiter.wait.call_args_list == [
+            call(TableName="user_table"),
+            call(TableName="user_counters"),
+        ]
+
+    def test_create_tables_adds_missing_email_index(self, setup_dynamodb_mock):
+        mock_client, _, _ = setup_dynamodb_mock
+        mock_client.describe_table.return_value = {"Table": {}}
+
+        from api.dynamodb import create_user_table
+
+        create_user_table()
+
+        mock_client.create_table.assert_not_called()
+        mock_client.update_table.assert_called_once()
+
+    def test_create_tables_keeps_existing_email_index(self, setup_dynamodb_mock):
+        mock_client, _, _ = setup_dynamodb_mock
+        mock_client.describe_table.return_value = {
+            "Table": {"GlobalSecondaryIndexes": [{"IndexName": "email-index"}]}
+        }
+
+        from api.dynamodb import create_user_table
+
+        create_user_table()
+
+        mock_client.update_table.assert_not_called()
 
     def test_list_tables(self, setup_dynamodb_mock):
         mock_client, _, _ = setup_dynamodb_mock
@@ -53,3 +85,65 @@ class TestDynamoDBIntegration:
 
         mock_resource.Table.assert_called_once_with("user_table")
         assert result == mock_table
+
+    def test_handles_are_built_lazily_once(self):
+        import api.dynamodb as dynamodb
+
+        with patch.object(dynamodb, "dynamodb_client", None), patch.object(
+            dynamodb, "dynamodb_resource", None
+        ), patch.object(dynamodb, "STORAGE_BACKEND", "dynamodb"), patch(
+            "boto3.session.Session"
+        ) as mock_session:
+            client = dynamodb.get_dynamodb_client()
+            resource = dynamodb.get_dynamodb_resource()
+            dynamodb.get_dynamodb_client()
+
+        mock_session.return_value.resource.assert_called_once()
+        assert resource is mock_session.return_value.resource.return_value
+        assert client is resource.meta.client
+
+    def test_client_config_from_environment(self):
+        from api.dynamodb import client_config
+
+        with patch.dict(
+            "os.environ",
+            {
+                "DYNAMODB_MAX_POOL_CONNECTIONS": "64",
+                "DYNAMODB_CONNECT_TIMEOUT": "1.5",
+                "DYNAMODB_RETRY_MODE": "adaptive",
+                "DYNAMODB_TCP_KEEPALIVE": "0",
+            },
+        ):
+            config = client_config()
+
+        assert config.max_pool_connections == 64
+        assert config.connect_timeout == 1.5
+        assert config.retries["mode"] == "adaptive"
+        assert config.tcp_keepalive is False
+
+    def test_importing_package_makes_no_calls(self, setup_dynamodb_mock):
+        import importlib
+
+        import api
+
+        mock_client, mock_resource, _ = setup_dynamodb_mock
+        importlib.reload(api)
+
+        mock_client.describe_table.assert_not_called()
+        mock_client.list_tables.assert_not_called()
+        mock_resource.Table.assert_not_called()
+
+    def test_memory_backend_needs_no_dynamodb(self):
+        import api.dynamodb as dynamodb
+        from api.storage import MemoryResource
+
+        with patch.object(dynamodb, "dynamodb_resource", None), patch.object(
+            dynamodb, "STORAGE_BACKEND", "memory"
+        ), patch("boto3.session.Session") as mock_session:
+            dynamodb.create_tables()
+            table = dynamodb.get_user_table()
+            assert isinstance(dynamodb.get_dynamodb_resource(), MemoryResource)
+            assert dynamodb.list_tables() == ["user_table"]
+
+        mock_session.assert_not_called()
+        assert table.name == "user_table"
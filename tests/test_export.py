@@ -0,0 +1,106 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from api import export
+from api.app import app
+from api.records import User
+
+PAGES = [
+    ([{"user_id": "1", "name": "A, B", "email": "a@example.com"}], "cursor"),
+    ([User("2", "C", "c@example.com", {"score": Decimal("5")})], None),
+]
+
+
+@patch("api.models.UserModel.iter_pages", side_effect=lambda **_: iter(PAGES))
+class TestExportChunks(unittest.TestCase):
+    def test_ndjson_one_chunk_per_page(self, mock_iter_pages):
+        chunks = list(export.export_chunks("ndjson", app.json.dumps))
+
+        self.assertEqual(len(chunks), 2)
+        rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+        self.assertEqual(rows[1], {**PAGES[1][0][0].to_dict(), "score": 5})
+        mock_iter_pages.assert_called_once_with(
+            limit=export.EXPORT_PAGE_SIZE, fields=None
+        )
+
+    def test_csv_header_and_quoting(self, _):
+        body = "".join(export.export_chunks("csv", app.json.dumps))
+
+        self.assertEqual(
+            body.splitlines(),
+            [
+                "user_id,name,email",
+                '1,"A, B",a@example.com',
+                "2,C,c@example.com",
+            ],
+        )
+
+    def test_csv_uses_requested_fields(self, _):
+        body = "".join(
+            export.export_chunks("csv", app.json.dumps, ["user_id", "score"])
+        )
+
+        self.assertEqual(body.splitlines(), ["user_id,score", "1,", "2,5"])
+
+    def test_unknown_format(self, mock_iter_pages):
+        with self.assertRaises(ValueError):
+            next(export.export_chunks("xml", app.json.dumps))
+        mock_iter_pages.assert_not_called()
+
+
+@patch("api.models.UserModel.iter_pages", side_effect=lambda **_: iter(PAGES))
+class TestExportEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+
+    def test_export_csv(self, _):
+        response = self.app.get("/users/export?format=csv")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/csv")
+        self.assertIn("filename=users.csv", response.headers["Content-Disposition"])
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 3)
+
+    def test_export_gzip(self, _):
+        response = self.app.get("/users/export?gzip=1")
+
+        self.assertEqual(response.mimetype, "application/gzip")
+        self.assertEqual(len(gzip.decompress(response.data).splitlines()), 2)
+
+    @patch("api.app.MAX_RESPONSE_BYTES", 0)
+    def test_export_streams_without_cap(self, _):
+        response = self.app.get("/users/export")
+
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 2)
+
+    @patch("api.app.MAX_RESPONSE_BYTES", 100)
+    def test_export_over_cap(self, mock_iter_pages):
+        response = self.app.get("/users/export")
+
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("flask export-users", response.get_json()["error"])
+
+    def test_export_invalid_format(self, _):
+        response = self.app.get("/users/export?format=xml")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_cli(self, _):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.csv.gz")
+
+            result = app.test_cli_runner().invoke(args=["export-users", path])
+
+            self.assertEqual(result.exit_code, 0, result.output)
+            with gzip.open(path, "rt") as f:
+                self.assertEqual(f.readline().strip(), "user_id,name,email")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+import base64
+import gzip
+import importlib.util
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from api import dynamodb, handler
+from api.models import UserModel
+
+
+def make_event(path, method="GET", headers=None, query=None):
+    headers = {"Accept": "application/json", **(headers or {})}
+    return {
+        "httpMethod": method,
+        "path": path,
+        "headers": headers,
+        "multiValueHeaders": {name: [value] for name, value in headers.items()},
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": query
+        and {name: [value] for name, value in query.items()},
+        "requestContext": {},
+        "body": None,
+        "isBase64Encoded": False,
+    }
+
+
+class TestHandler(unittest.TestCase):
+    def setUp(self):
+        self.mock_user = {"user_id": "test123", "name": "Test User"}
+        patcher = patch("api.handler.wsgi_handler", return_value={"statusCode": 200})
+        self.mock_wsgi = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_health_check(self):
+        response = handler.handler(make_event("/health"), None)
+
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(json.loads(response["body"]), {"status": "healthy"})
+        self.assertIn("Server-Timing", response["headers"])
+        self.mock_wsgi.assert_not_called()
+
+    @patch("api.models.UserModel.get")
+    def test_get_user(self, mock_get):
+        mock_get.return_value = self.mock_user
+
+        response = handler.handler(make_event("/users/test123"), None)
+
+        mock_get.assert_called_once_with("test123", fields=None)
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(json.loads(response["body"]), self.mock_user)
+        self.assertEqual(response["headers"]["Content-Type"], "application/json")
+        self.assertIn("ETag", response["headers"])
+        self.mock_wsgi.assert_not_called()
+
+    @patch("api.models.UserModel.get")
+    def test_get_user_any_accept(self, mock_get):
+        mock_get.return_value = self.mock_user
+        for accept in ("*/*", ""):
+            with self.subTest(accept=accept):
+                event = make_event("/users/test123", headers={"Accept": accept})
+                response = handler.handler(event, None)
+
+                self.assertEqual(response["statusCode"], 200)
+                self.assertEqual(response["headers"]["Vary"], "Accept, Accept-Encoding")
+        self.mock_wsgi.assert_not_called()
+
+    @patch("api.models.UserModel.get")
+    def test_get_user_compressed(self, mock_get):
+        mock_get.return_value = dict(self.mock_user, bio="x" * 1000)
+        event = make_event("/users/test123", headers={"Accept-Encoding": "gzip"})
+
+        response = handler.handler(event, None)
+
+        self.assertTrue(response["isBase64Encoded"])
+        self.assertEqual(response["headers"]["Content-Encoding"], "gzip")
+        self.assertTrue(response["headers"]["ETag"].startswith('W/"'))
+        body = gzip.decompress(base64.b64decode(response["body"]))
+        self.assertEqual(json.loads(body), mock_get.return_value)
+
+    @patch("api.models.UserModel.get")
+    def test_get_user_fields(self, mock_get):
+        mock_get.return_value = {"name": "Test User"}
+
+        handler.handler(
+            make_event("/users/test123", query={"fields": "name, email"}), None
+        )
+
+        mock_get.assert_called_once_with("test123", fields=["name", "email"])
+
+    @patch("api.models.UserModel.get")
+    def test_get_user_not_modified(self, mock_get):
+        mock_get.return_value = self.mock_user
+        etag = handler.handler(make_event("/users/test123"), None)["headers"]["ETag"]
+
+        response = handler.handler(
+            make_event("/users/test123", headers={"If-None-Match": etag}), None
+        )
+
+        self.assertEqual(response["statusCode"], 304)
+        self.assertEqual(response["body"], "")
+
+    @patch("api.models.UserModel.get")
+    def test_get_user_not_found(self, mock_get):
+        mock_get.side_effect = Exception("DoesNotExist")
+
+        response = handler.handler(make_event("/users/missing"), None)
+
+        self.assertEqual(response["statusCode"], 404)
+        self.assertEqual(json.loads(response["body"]), {"error": "User not found"})
+        self.assertEqual(response["headers"]["Vary"], "Accept, Accept-Encoding")
+
+    def test_http_api_event(self):
+        event = {
+            "rawPath": "/health",
+            "headers": {"accept": "application/json"},
+            "requestContext": {"http": {"method": "GET"}},
+        }
+
+        response = handler.handler(event, None)
+
+        self.assertEqual(response["statusCode"], 200)
+        self.mock_wsgi.assert_not_called()
+
+    def test_falls_back_to_wsgi(self):
+        events = [
+            make_event("/users/test123", headers={"Accept": "text/html"}),
+            make_event("/users/count"),
+            make_event("/users/test123", method="DELETE"),
+            make_event("/users"),
+        ]
+        for event in events:
+            with self.subTest(event=event["path"]):
+                self.assertEqual(handler.handler(event, None), {"statusCode": 200})
+                self.mock_wsgi.assert_called_with(event, None)
+
+    def test_non_http_events_go_to_wsgi_handler(self):
+        events = [
+            {"_serverless-wsgi": {"command": "flask", "data": "routes"}},
+            {"source": "serverless-plugin-warmup"},
+        ]
+        for event in events:
+            with self.subTest(event=event):
+                self.assertEqual(handler.handler(event, None), {"statusCode": 200})
+                self.mock_wsgi.assert_called_with(event, None)
+
+
+class TestWSGIHandler(unittest.TestCase):
+    def test_delegates_to_plugin_handler(self):
+        entry = MagicMock()
+        entry.handler.return_value = {"output": "routes"}
+        event = {"_serverless-wsgi": {"command": "flask", "data": "routes"}}
+        with patch.dict("sys.modules", {"wsgi_handler": entry}):
+            self.assertEqual(handler.wsgi_handler(event, None), {"output": "routes"})
+        entry.handler.assert_called_once_with(event, None)
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("serverless_wsgi"), "serverless-wsgi not installed"
+)
+class TestParityWithFlask(unittest.TestCase):
+    # The fast path must answer exactly like serverless-wsgi + Flask
+    def setUp(self):
+        patcher = patch.object(
+            dynamodb, "dynamodb_resource", dynamodb.memory_resource()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        UserModel.create({"user_id": "u1", "name": "N" * 600, "email": "u1@x.com"})
+        self.addCleanup(UserModel.delete, "u1")
+
+    def test_same_responses(self):
+        events = [
+            make_event("/health"),
+            make_event("/users/u1", headers={"Accept": "*/*"}),
+            make_event("/users/u1", headers={"Accept-Encoding": "gzip"}),
+            make_event("/users/u1", query={"fields": "name"}),
+            make_event("/users/missing"),
+            make_event("/users/u1", query={"fields": "bad.path"}),
+        ]
+        for event in events:
+            with self.subTest(path=event["path"], headers=event["headers"]):
+                native = handler.handler(dict(event), None)
+                with patch.dict("sys.modules", {"wsgi_handler": None}):
+                    wsgi = handler.wsgi_handler(dict(event), None)
+                wsgi_headers = wsgi.get("headers") or {
+                    name: values[0]
+                    for name, values in wsgi["multiValueHeaders"].items()
+                }
+                for volatile in ("Date", "Server-Timing", "Content-Length"):
+                    native["headers"].pop(volatile, None)
+                    wsgi_headers.pop(volatile, None)
+
+                self.assertEqual(native["statusCode"], wsgi["statusCode"])
+                self.assertEqual(native["body"], wsgi["body"])
+                self.assertEqual(native["isBase64Encoded"], wsgi["isBase64Encoded"])
+                self.assertEqual(native["headers"], wsgi_headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from flask import Flask
+
+from api.json_provider import JSONProvider, response_body
+
+
+class TestJSONProvider(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.json = JSONProvider(self.app)
+        self.item = {
+            "user_id": "test123",
+            "age": Decimal("42"),
+            "score": Decimal("9.5"),
+            "big": Decimal("1" + "0" * 30),
+            "tags": {"b", "a"},
+        }
+        self.expected = {
+            "age": 42,
+            "big": 1e30,
+            "score": 9.5,
+            "tags": ["a", "b"],
+            "user_id": "test123",
+        }
+
+    def check_provider(self):
+        with self.app.app_context():
+            dumped = self.app.json.dumps(self.item)
+            response = self.app.json.response(self.item)
+
+        self.assertEqual(json.loads(dumped), self.expected)
+        self.assertEqual(json.loads(response.get_data()), self.expected)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertLess(dumped.index('"age"'), dumped.index('"user_id"'))
+
+    def test_converts_decimals_and_sets(self):
+        self.check_provider()
+
+    @patch("api.json_provider.orjson", None)
+    def test_stdlib_fallback(self):
+        self.check_provider()
+
+    def test_response_body_matches_response(self):
+        with self.app.app_context():
+            response = self.app.json.response(self.item)
+        self.assertEqual(response_body(self.item), response.get_data())
+
+    @patch("api.json_provider.orjson", None)
+    def test_response_body_stdlib_fallback(self):
+        self.test_response_body_matches_response()
+
+    def test_loads(self):
+        self.assertEqual(self.app.json.loads('{"a": [1, 2.5]}'), {"a": [1, 2.5]})
+
+    def test_unsupported_type_raises(self):
+        with self.assertRaises(TypeError):
+            self.app.json.dumps({"value": object()})
@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import boto3
+from botocore.stub import Stubber
+
+from api import metrics
+from api.app import app
+from api.models import UserModel
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = metrics.Histogram(buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        lines = histogram.render("latency", (("route", "x"),))
+
+        self.assertIn('latency_bucket{route="x",le="0.1"} 1', lines)
+        self.assertIn('latency_bucket{route="x",le="1.0"} 2', lines)
+        self.assertIn('latency_bucket{route="x",le="+Inf"} 3', lines)
+        self.assertIn('latency_count{route="x"} 3', lines)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+        patcher = patch.object(metrics, "registry", self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("api.models.get_user_table")
+    def test_user_model_calls_are_timed(self, mock_get_table):
+        mock_get_table.return_value.get_item.return_value = {}
+
+        with self.assertRaises(Exception):
+            UserModel.get("missing")
+
+        key = (("operation", "get"),)
+        self.assertEqual(self.registry.operations[key].count, 1)
+        self.assertEqual(self.registry.operation_errors[key], 1)
+
+    def test_client_hooks_record_consumed_capacity(self):
+        client = boto3.client(
+            "dynamodb",
+            region_name="us-east-1",
+            aws_access_key_id="x",
+            aws_secret_access_key="y",
+        )
+        metrics.register_client_hooks(client)
+        with Stubber(client) as stubber:
+            stubber.add_response(
+                "get_item",
+                {"ConsumedCapacity": {"TableName": "users", "CapacityUnits": 0.5}},
+            )
+            client.get_item(TableName="users", Key={"user_id": {"S": "1"}})
+
+        self.assertEqual(self.registry.calls[(("operation", "GetItem"),)], 1)
+        self.assertEqual(
+            self.registry.capacity[(("operation", "GetItem"), ("table", "users"))],
+            0.5,
+        )
+
+    def test_consumed_capacity_is_requested_where_supported(self):
+        client = boto3.client("dynamodb", region_name="us-east-1")
+        service_model = client.meta.service_model
+        params = {}
+        metrics._add_capacity_param(params, service_model.operation_model("Scan"))
+        self.assertEqual(params, {"ReturnConsumedCapacity": "TOTAL"})
+
+        params = {}
+        metrics._add_capacity_param(
+            params, service_model.operation_model("DescribeTable")
+        )
+        self.assertEqual(params, {})
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+
+    def test_server_timing_header(self):
+        response = self.app.get("/health")
+
+        self.assertIn("total;dur=", response.headers["Server-Timing"])
+
+    @patch("api.models.get_user_table")
+    def test_server_timing_includes_user_model_calls(self, mock_get_table):
+        mock_get_table.return_value = MagicMock()
+        mock_get_table.return_value.delete_item.return_value = {}
+
+        response = self.app.delete("/users/1")
+
+        self.assertIn("delete;dur=", response.headers["Server-Timing"])
+
+    def test_metrics_exposition(self):
+        self.app.get("/health")
+
+        response = self.app.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith("text/plain"))
+        body = response.get_data(as_text=True)
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="health_check",'
+            'status="200"}',
+            body,
+        )
+        self.assertIn("user_cache_hits_total", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,33 @@ from unittest.mock import MagicMock, patch
 
 from botocore.exceptions import ClientError
 
-from api.models import UserModel
+from api.models import UserModel, decode_cursor, encode_cursor, update_kwargs
+
+
+def condition_failed(old_item=None):
+    response = {"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}}
+    if old_item:
+        response["Item"] = old_item
+    return ClientError(response, "PutItem")
+
+
+def transaction_cancelled(*reasons):
+    response = {
+        "Error": {"Code": "TransactionCanceledException", "Message": ""},
+        "CancellationReasons": list(reasons),
+    }
+    return ClientError(response, "TransactWriteItems")
+
+
+COUNT_UPDATE = {
+    "Update": {
+        "TableName": "user_counters",
+        "Key": {"counter_id": "users#0"},
+        "UpdateExpression": "ADD #total :delta",
+        "ExpressionAttributeNames": {"#total": "total"},
+        "ExpressionAttributeValues": {":delta": 1},
+    }
+}
 
 
 class TestUserModel(unittest.TestCase):
@@ -47,16 +73,136 @@ class TestUserModel(unittest.TestCase):
             UserModel.get("test123")
 
     @patch("api.models.get_user_table")
-    def test_create_user_success(self, mock_get_table):
+    def test_get_user_with_projection(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        self.mock_table.get_item.return_value = {"Item": {"name": "Test User"}}
+
+        result = UserModel.get("test123", fields=["name"])
+
+        self.mock_table.get_item.assert_called_once_with(
+            Key={"user_id": "test123"},
+            ProjectionExpression="#f0",
+            ExpressionAttributeNames={"#f0": "name"},
+        )
+        self.assertEqual(result, {"name": "Test User"})
+
+    def test_projection_rejects_invalid_fields(self):
+        with self.assertRaises(ValueError):
+            UserModel.get("test123", fields=["name", "a.b"])
+
+    @patch("api.models.get_user_table")
+    def test_scan_page_with_projection(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        self.mock_table.scan.return_value = {"Items": []}
+
+        UserModel.scan_page(fields=["user_id", "email", "user_id"])
+
+        self.mock_table.scan.assert_called_once_with(
+            ProjectionExpression="#f0, #f1",
+            ExpressionAttributeNames={"#f0": "user_id", "#f1": "email"},
+        )
+
+    @patch("api.models.get_user_table")
+    def test_find_by_email_queries_index(self, mock_get_table):
         mock_get_table.return_value = self.mock_table
+        self.mock_table.query.return_value = {"Items": [self.mock_user]}
+
+        result = UserModel.find_by_email("test@example.com")
+
+        self.mock_table.query.assert_called_once_with(
+            IndexName="email-index",
+            KeyConditionExpression="#email = :email",
+            ExpressionAttributeNames={"#email": "email"},
+            ExpressionAttributeValues={":email": "test@example.com"},
+        )
+        self.mock_table.scan.assert_not_called()
+        self.assertEqual(result, [self.mock_user])
+
+    @patch("api.counters.random.randrange", return_value=0)
+    @patch("api.models.dynamodb.transact_write_items")
+    def test_create_user_success(self, mock_transact, _):
+        mock_transact.return_value = {}
 
         result = UserModel.create(self.mock_user)
 
-        self.mock_table.put_item.assert_called_once_with(Item=self.mock_user)
-        self.assertEqual(result, self.mock_user)
+        mock_transact.assert_called_once_with(
+            TransactItems=[
+                {
+                    "Put": {
+                        "TableName": "user_table",
+                        "Item": dict(self.mock_user, version=1),
+                        "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+                        "ConditionExpression": "attribute_not_exists(#user_id)",
+                        "ExpressionAttributeNames": {"#user_id": "user_id"},
+                    }
+                },
+                COUNT_UPDATE,
+            ]
+        )
+        self.assertEqual(result, dict(self.mock_user, version=1))
+
+    @patch("api.models.dynamodb.transact_write_items")
+    @patch("api.models.get_user_table")
+    def test_create_user_overwrite_bumps_version(self, mock_get_table, mock_transact):
+        mock_get_table.return_value = self.mock_table
+        mock_transact.side_effect = transaction_cancelled(
+            {
+                "Code": "ConditionalCheckFailed",
+                "Item": {"user_id": {"S": "test123"}, "version": {"N": "4"}},
+            },
+            {"Code": "None"},
+        )
+
+        result = UserModel.create(self.mock_user)
+
+        # The overwrite is a plain conditional put; the count is unchanged
+        mock_transact.assert_called_once()
+        retry = self.mock_table.put_item.call_args.kwargs
+        self.assertEqual(retry["Item"]["version"], 5)
+        self.assertEqual(retry["ExpressionAttributeValues"], {":expected": 4})
+        self.assertEqual(result["version"], 5)
+
+    @patch("api.models.backoff")
+    @patch("api.models.dynamodb.transact_write_items")
+    def test_create_user_retries_transaction_conflicts(self, mock_transact, backoff):
+        mock_transact.side_effect = [
+            transaction_cancelled({"Code": "None"}, {"Code": "TransactionConflict"}),
+            {},
+        ]
+
+        result = UserModel.create(self.mock_user)
+
+        self.assertEqual(mock_transact.call_count, 2)
+        backoff.assert_called_once_with(0)
+        self.assertEqual(result["version"], 1)
 
+    @patch("api.models.counters.USER_COUNT", False)
     @patch("api.models.get_user_table")
-    def test_create_user_client_error(self, mock_get_table):
+    def test_create_user_without_count_is_a_plain_put(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+
+        UserModel.create(self.mock_user)
+
+        self.mock_table.put_item.assert_called_once_with(
+            Item=dict(self.mock_user, version=1),
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            ConditionExpression="attribute_not_exists(#user_id)",
+            ExpressionAttributeNames={"#user_id": "user_id"},
+        )
+
+    @patch("api.models.dynamodb.transact_write_items")
+    def test_create_user_client_error(self, mock_transact):
+        mock_transact.side_effect = ClientError(
+            {"Error": {"Code": "InternalServerError", "Message": "Test error"}},
+            "operation",
+        )
+
+        with self.assertRaises(ClientError):
+            UserModel.create(self.mock_user)
+
+    @patch("api.models.counters.USER_COUNT", False)
+    @patch("api.models.get_user_table")
+    def test_create_user_put_error(self, mock_get_table):
         mock_get_table.return_value = self.mock_table
         self.mock_table.put_item.side_effect = ClientError(
             {"Error": {"Code": "InternalServerError", "Message": "Test error"}},
@@ -85,6 +231,94 @@ class TestUserModel(unittest.TestCase):
 
         self.assertEqual(result, [])
 
+    @patch("api.models.get_user_table")
+    def test_scan_users_follows_last_evaluated_key(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        other_user = dict(self.mock_user, user_id="test456")
+        self.mock_table.scan.side_effect = [
+            {"Items": [self.mock_user], "LastEvaluatedKey": {"user_id": "test123"}},
+            {"Items": [other_user]},
+        ]
+
+        result = UserModel.scan()
+
+        self.assertEqual(result, [self.mock_user, other_user])
+        self.assertEqual(self.mock_table.scan.call_count, 2)
+        self.mock_table.scan.assert_called_with(
+            ExclusiveStartKey={"user_id": "test123"}
+        )
+
+    @patch("api.models.get_user_table")
+    def test_scan_page_returns_cursor(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        self.mock_table.scan.return_value = {
+            "Items": [self.mock_user],
+            "LastEvaluatedKey": {"user_id": "test123"},
+        }
+
+        items, cursor = UserModel.scan_page(limit=1)
+
+        self.mock_table.scan.assert_called_once_with(Limit=1)
+        self.assertEqual(items, [self.mock_user])
+        self.assertEqual(decode_cursor(cursor), {"user_id": "test123"})
+
+    @patch("api.models.get_user_table")
+    def test_scan_page_last_page(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        self.mock_table.scan.return_value = {"Items": [self.mock_user]}
+
+        items, cursor = UserModel.scan_page(
+            limit=10, cursor=encode_cursor({"user_id": "test000"})
+        )
+
+        self.mock_table.scan.assert_called_once_with(
+            Limit=10, ExclusiveStartKey={"user_id": "test000"}
+        )
+        self.assertIsNone(cursor)
+
+    def test_decode_cursor_invalid(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_decode_cursor_rejects_other_keys(self):
+        for key in (
+            {"user_id": [1]},
+            {"user_id": 1},
+            {"user_id": "test123", "email": "a@example.com"},
+            ["user_id"],
+        ):
+            with self.subTest(key=key), self.assertRaises(ValueError):
+                decode_cursor(encode_cursor(key))
+
+    @patch("api.models.get_user_table")
+    def test_scan_segment_pages(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        self.mock_table.scan.side_effect = [
+            {"Items": [self.mock_user], "LastEvaluatedKey": {"user_id": "test123"}},
+            {"Items": []},
+        ]
+
+        result = UserModel.scan_segment(1, 4)
+
+        self.assertEqual(result, [self.mock_user])
+        self.mock_table.scan.assert_called_with(
+            Segment=1, TotalSegments=4, ExclusiveStartKey={"user_id": "test123"}
+        )
+
+    @patch("api.models.get_user_table")
+    def test_parallel_scan_merges_segments(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        self.mock_table.scan.side_effect = lambda **kwargs: {
+            "Items": [{"user_id": f"user{kwargs['Segment']}"}]
+        }
+
+        result = UserModel.parallel_scan(total_segments=3, max_workers=2)
+
+        self.assertEqual(
+            sorted(item["user_id"] for item in result), ["user0", "user1", "user2"]
+        )
+        self.assertEqual(self.mock_table.scan.call_count, 3)
+
     @patch("api.models.get_user_table")
     def test_scan_users_client_error(self, mock_get_table):
         mock_get_table.return_value = self.mock_table
@@ -96,20 +330,279 @@ class TestUserModel(unittest.TestCase):
         with self.assertRaises(ClientError):
             UserModel.scan()
 
+    @patch("api.models.backoff")
+    @patch("api.models.get_dynamodb_resource")
+    def test_batch_get_retries_unprocessed_keys(self, mock_get_resource, _):
+        mock_resource = mock_get_resource.return_value
+        other_user = dict(self.mock_user, user_id="test456")
+        mock_resource.batch_get_item.side_effect = [
+            {
+                "Responses": {"user_table": [other_user]},
+                "UnprocessedKeys": {"user_table": {"Keys": [{"user_id": "test123"}]}},
+            },
+            {"Responses": {"user_table": [self.mock_user]}},
+        ]
+
+        users, missing = UserModel.batch_get(["test123", "test456", "nope"])
+
+        self.assertEqual(users, [self.mock_user, other_user])
+        self.assertEqual(missing, ["nope"])
+        self.assertEqual(mock_resource.batch_get_item.call_count, 2)
+        mock_resource.batch_get_item.assert_called_with(
+            RequestItems={"user_table": {"Keys": [{"user_id": "test123"}]}}
+        )
+
+    @patch("api.models.get_dynamodb_resource")
+    def test_batch_get_chunks_keys(self, mock_get_resource):
+        mock_resource = mock_get_resource.return_value
+        mock_resource.batch_get_item.return_value = {"Responses": {"user_table": []}}
+        user_ids = [f"user{i}" for i in range(250)]
+
+        users, missing = UserModel.batch_get(user_ids + ["user0"])
+
+        self.assertEqual(users, [])
+        self.assertEqual(missing, user_ids)
+        self.assertEqual(mock_resource.batch_get_item.call_count, 3)
+
+    @patch("api.models.backoff")
+    @patch("api.models.get_dynamodb_resource")
+    def test_batch_create_writes_chunks(self, mock_get_resource, _):
+        mock_resource = mock_get_resource.return_value
+        unprocessed = {"user_table": [{"PutRequest": {"Item": self.mock_user}}]}
+        mock_resource.batch_write_item.side_effect = [
+            {"UnprocessedItems": unprocessed},
+            {},
+            {},
+        ]
+        mock_resource.batch_get_item.return_value = {"Responses": {"user_table": []}}
+        records = [(i, {"user_id": f"user{i}"}) for i in range(30)]
+
+        written, failures = UserModel.batch_create(iter(records))
+
+        self.assertEqual(written, 30)
+        self.assertEqual(failures, [])
+        self.assertEqual(mock_resource.batch_write_item.call_count, 3)
+
+    @patch("api.models.get_dynamodb_resource")
+    def test_batch_create_reports_failed_chunk(self, mock_get_resource):
+        mock_resource = mock_get_resource.return_value
+        mock_resource.batch_write_item.side_effect = ClientError(
+            {"Error": {"Code": "ValidationException", "Message": "Test error"}},
+            "BatchWriteItem",
+        )
+        mock_resource.batch_get_item.return_value = {"Responses": {"user_table": []}}
+
+        written, failures = UserModel.batch_create([(1, self.mock_user)])
+
+        self.assertEqual(written, 0)
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0][0], 1)
+
+    @patch("api.models.invalidate")
+    @patch("api.models.get_dynamodb_resource")
+    def test_batch_create_settles_sent_chunks_when_source_fails(
+        self, mock_get_resource, mock_invalidate
+    ):
+        mock_resource = mock_get_resource.return_value
+        mock_resource.batch_write_item.return_value = {}
+        mock_resource.batch_get_item.return_value = {"Responses": {"user_table": []}}
+
+        def records():
+            for i in range(25):
+                yield i, {"user_id": f"user{i}"}
+            raise RuntimeError("source failed")
+
+        with self.assertRaises(RuntimeError):
+            UserModel.batch_create(records())
+
+        self.assertEqual(mock_invalidate.call_count, 25)
+
+    @patch("api.models.get_dynamodb_resource")
+    def test_batch_delete_chunks_and_dedupes(self, mock_get_resource):
+        mock_resource = mock_get_resource.return_value
+        mock_resource.batch_write_item.return_value = {}
+        mock_resource.batch_get_item.side_effect = lambda RequestItems: {
+            "Responses": {
+                "user_table": [
+                    key
+                    for key in RequestItems["user_table"]["Keys"]
+                    if key["user_id"] != "user7"
+                ]
+            }
+        }
+        user_ids = [f"user{i}" for i in range(30)]
+
+        deleted, not_found, failures = UserModel.batch_delete(
+            iter(user_ids + ["user29"])
+        )
+
+        self.assertEqual(deleted, 29)
+        self.assertEqual(not_found, ["user7"])
+        self.assertEqual(failures, [])
+        self.assertEqual(mock_resource.batch_write_item.call_count, 2)
+        requests = [
+            request
+            for call in mock_resource.batch_write_item.call_args_list
+            for request in call.kwargs["RequestItems"]["user_table"]
+        ]
+        self.assertEqual(requests[0], {"DeleteRequest": {"Key": {"user_id": "user0"}}})
+        self.assertEqual(len(requests), 30)
+
+    @patch("api.models.UserModel._scan_call")
+    def test_parallel_scan_streams_pages(self, mock_scan_call):
+        # An endless segment: the scan must yield before it is exhausted
+        mock_scan_call.side_effect = lambda kwargs, paced: (
+            [{"user_id": "user"}],
+            {"user_id": "user"},
+        )
+
+        with patch("api.models.SCAN_QUEUE_PAGES", 2):
+            scan = UserModel.iter_parallel_scan(total_segments=1)
+            self.assertEqual(next(scan), {"user_id": "user"})
+            scan.close()
+        calls = mock_scan_call.call_count
+
+        # Bounded by the queue, and closing stopped the worker
+        self.assertLessEqual(calls, 5)
+        self.assertEqual(mock_scan_call.call_count, calls)
+
+    @patch("api.models.UserModel._scan_call")
+    def test_parallel_scan_raises_segment_errors(self, mock_scan_call):
+        mock_scan_call.side_effect = ClientError(
+            {"Error": {"Code": "ValidationException", "Message": ""}}, "Scan"
+        )
+
+        with self.assertRaises(ClientError):
+            list(UserModel.iter_parallel_scan(total_segments=2))
+
+    @patch("api.models.UserModel.iter_parallel_scan")
+    def test_iter_matching_ids(self, mock_scan):
+        mock_scan.return_value = iter(
+            [
+                {"user_id": "1", "email": "a@example.com"},
+                {"user_id": "2", "email": "b@example.com"},
+            ]
+        )
+
+        user_ids = list(UserModel.iter_matching_ids({"email": "b@example.com"}))
+
+        self.assertEqual(user_ids, ["2"])
+        mock_scan.assert_called_once_with(fields=["user_id", "email"])
+
+    @patch("api.models.invalidate")
     @patch("api.models.get_user_table")
-    def test_delete_user_success(self, mock_get_table):
+    def test_update_user(self, mock_get_table, mock_invalidate):
         mock_get_table.return_value = self.mock_table
-        self.mock_table.delete_item.return_value = {}
+        self.mock_table.update_item.return_value = {
+            "Attributes": {"name": "New", "version": 3}
+        }
+
+        result = UserModel.update("test123", {"name": "New", "nickname": None}, 2)
+
+        self.mock_table.update_item.assert_called_once_with(
+            Key={"user_id": "test123"},
+            ReturnValues="UPDATED_NEW",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            UpdateExpression="SET #f0 = :v0, "
+            "#version = if_not_exists(#version, :zero) + :one REMOVE #f1",
+            ConditionExpression="attribute_exists(#user_id) AND #version = :expected",
+            ExpressionAttributeNames={
+                "#user_id": "user_id",
+                "#version": "version",
+                "#f0": "name",
+                "#f1": "nickname",
+            },
+            ExpressionAttributeValues={
+                ":zero": 0,
+                ":one": 1,
+                ":v0": "New",
+                ":expected": 2,
+            },
+        )
+        mock_invalidate.assert_called_once_with("test123")
+        self.assertEqual(result, {"name": "New", "version": 3})
+
+    @patch("api.models.get_user_table")
+    def test_update_user_condition_failures(self, mock_get_table):
+        mock_get_table.return_value = self.mock_table
+        cases = [
+            (None, None, "DoesNotExist"),
+            (1, None, "DoesNotExist"),
+            (
+                1,
+                {"user_id": {"S": "test123"}, "version": {"N": "2"}},
+                "VersionConflict",
+            ),
+        ]
+        for version, old_item, error in cases:
+            with self.subTest(version=version, error=error):
+                self.mock_table.update_item.side_effect = condition_failed(old_item)
+                with self.assertRaises(Exception) as context:
+                    UserModel.update("test123", {"name": "New"}, version)
+                self.assertEqual(str(context.exception), error)
+
+    def test_update_kwargs_version_zero(self):
+        kwargs = update_kwargs({"name": "New"}, expected_version=0)
+
+        self.assertEqual(
+            kwargs["ConditionExpression"],
+            "attribute_exists(#user_id) AND attribute_not_exists(#version)",
+        )
+        self.assertNotIn(":expected", kwargs["ExpressionAttributeValues"])
+
+    def test_update_user_rejects_invalid_changes(self):
+        for changes in ({}, {"user_id": "x"}, {"version": 2}, {"bad field": 1}):
+            with self.assertRaises(ValueError):
+                UserModel.update("test123", changes)
+
+    @patch("api.counters.random.randrange", return_value=0)
+    @patch("api.models.dynamodb.transact_write_items")
+    def test_delete_user_success(self, mock_transact, _):
+        mock_transact.return_value = {}
 
         result = UserModel.delete("test123")
 
-        self.mock_table.delete_item.assert_called_once_with(Key={"user_id": "test123"})
+        count_update = {"Update": dict(COUNT_UPDATE["Update"])}
+        count_update["Update"]["ExpressionAttributeValues"] = {":delta": -1}
+        mock_transact.assert_called_once_with(
+            TransactItems=[
+                {
+                    "Delete": {
+                        "TableName": "user_table",
+                        "Key": {"user_id": "test123"},
+                        "ConditionExpression": "attribute_exists(#user_id)",
+                        "ExpressionAttributeNames": {"#user_id": "user_id"},
+                    }
+                },
+                count_update,
+            ]
+        )
         self.assertEqual(result, {})
 
+    @patch("api.models.dynamodb.transact_write_items")
+    def test_delete_missing_user_leaves_count(self, mock_transact):
+        mock_transact.side_effect = transaction_cancelled(
+            {"Code": "ConditionalCheckFailed"}, {"Code": "None"}
+        )
+
+        self.assertEqual(UserModel.delete("missing"), {})
+
+    @patch("api.models.counters.USER_COUNT", False)
     @patch("api.models.get_user_table")
-    def test_delete_user_client_error(self, mock_get_table):
+    def test_delete_user_without_count(self, mock_get_table):
         mock_get_table.return_value = self.mock_table
-        self.mock_table.delete_item.side_effect = ClientError(
+        self.mock_table.delete_item.return_value = {}
+
+        result = UserModel.delete("test123")
+
+        self.mock_table.delete_item.assert_called_once_with(
+            Key={"user_id": "test123"}, ReturnValues="ALL_OLD"
+        )
+        self.assertEqual(result, {})
+
+    @patch("api.models.dynamodb.transact_write_items")
+    def test_delete_user_client_error(self, mock_transact):
+        mock_transact.side_effect = ClientError(
             {"Error": {"Code": "InternalServerError", "Message": "Test error"}},
             "operation",
         )
@@ -0,0 +1,134 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from api import throttle
+from api.profiler import Profiler, SpaceSaving, item_size
+from api.storage import MemoryResource
+from tests.helpers import FakeClock
+
+
+class TestSpaceSaving(unittest.TestCase):
+    def test_counts_exactly_within_capacity(self):
+        sketch = SpaceSaving(3)
+        for key in "aababc":
+            sketch.add(key)
+
+        self.assertEqual(sketch.top(2), [("a", 3, 0), ("b", 2, 0)])
+
+    def test_new_key_replaces_smallest(self):
+        sketch = SpaceSaving(2)
+        for key in "aaab":
+            sketch.add(key)
+        sketch.add("c")
+
+        self.assertEqual(sketch.top(2), [("a", 3, 0), ("c", 2, 1)])
+        self.assertEqual(len(sketch.counts), 2)
+
+    def test_heavy_hitters_survive_a_long_tail(self):
+        sketch = SpaceSaving(10)
+        for i in range(1000):
+            sketch.add("hot")
+            sketch.add(f"cold{i}")
+
+        self.assertEqual(sketch.top(1)[0][:2], ("hot", 1000))
+
+
+class TestItemSize(unittest.TestCase):
+    def test_sizes(self):
+        self.assertEqual(item_size("abc"), 3)
+        self.assertEqual(item_size(Decimal("12345")), 4)
+        self.assertEqual(item_size(True), 1)
+        self.assertEqual(item_size({"id": "x"}), 3 + 2 + 1 + 1)
+        self.assertEqual(item_size(["a", "b"]), 3 + 2 + 2)
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.profiler = Profiler(
+            sample_rate=0.5, top_k=2, log_interval=60, clock=self.clock
+        )
+
+    def test_summary(self):
+        for _ in range(3):
+            self.profiler.observe(
+                "get_item", {"Key": {"user_id": "hot"}}, {"Item": {"a": "x"}}, 0.002
+            )
+        # Unrecognised request shapes are still timed
+        self.profiler.observe("batch_write_item", {}, {}, 0.02)
+
+        summary = self.profiler.summary()
+
+        self.assertEqual(summary["samples"], 4)
+        self.assertEqual(
+            summary["hot_reads"], [{"user_id": "hot", "estimated": 6, "error": 0}]
+        )
+        self.assertEqual(summary["hot_writes"], [])
+        get_item = summary["operations"]["get_item"]
+        self.assertEqual((get_item["samples"], get_item["p95_ms"]), (3, 5.0))
+        self.assertEqual(get_item["item_bytes"], {"items": 3, "mean": 6, "p95": 100})
+
+    def test_batch_writes(self):
+        kwargs = {
+            "RequestItems": {
+                "user_table": [
+                    {"PutRequest": {"Item": {"user_id": "new"}}},
+                    {"DeleteRequest": {"Key": {"user_id": "old"}}},
+                ]
+            }
+        }
+        self.profiler.observe("batch_write_item", kwargs, {}, 0.02)
+
+        writes = [entry["user_id"] for entry in self.profiler.summary()["hot_writes"]]
+        self.assertEqual(sorted(writes), ["new", "old"])
+
+    def test_logs_summary_periodically(self):
+        with self.assertLogs("api.profiler", level="INFO") as logs:
+            self.profiler.record("scan", 0.01)
+            self.clock.now = 61
+            self.profiler.record("scan", 0.01)
+            self.profiler.record("scan", 0.01)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('"samples": 2', logs.output[0])
+
+    def test_reset(self):
+        self.profiler.record("get_item", 0.01, reads=["a"])
+        self.profiler.reset()
+
+        summary = self.profiler.summary()
+        self.assertEqual((summary["samples"], summary["hot_reads"]), (0, []))
+
+    def test_disabled_never_samples(self):
+        self.assertFalse(Profiler(sample_rate=0).sampled())
+
+
+class TestThrottleIntegration(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profiler(sample_rate=1, log_interval=0)
+        patcher = patch("api.throttle.profiler", self.profiler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sampled_calls_are_profiled(self):
+        table = MemoryResource().Table("user_table")
+        table.put_item(Item={"user_id": "a", "name": "A"})
+        for _ in range(2):
+            throttle.call("read", table.get_item, Key={"user_id": "a"})
+        throttle.call("write", table.put_item, Item={"user_id": "b"})
+
+        summary = self.profiler.summary()
+        self.assertEqual(summary["hot_reads"][0]["user_id"], "a")
+        self.assertEqual(summary["hot_reads"][0]["estimated"], 2)
+        self.assertEqual(set(summary["operations"]), {"get_item", "put_item"})
+
+    def test_unsampled_calls_are_skipped(self):
+        self.profiler.sample_rate = 0
+        throttle.call("read", MagicMock(return_value={}))
+
+        self.assertEqual(self.profiler.summary()["samples"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
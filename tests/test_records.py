@@ -0,0 +1,97 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from api.app import app
+from api.models import UserModel, decode_cursor, encode_cursor
+from api.records import User
+
+
+class TestUserRecord(unittest.TestCase):
+    def setUp(self):
+        self.item = {
+            "user_id": {"S": "test123"},
+            "name": {"S": "Test User"},
+            "email": {"S": "test@example.com"},
+        }
+
+    def test_from_item_known_schema(self):
+        record = User.from_item(self.item)
+
+        self.assertEqual(record.user_id, "test123")
+        self.assertIsNone(record.extra)
+        self.assertEqual(
+            record.to_dict(),
+            {"user_id": "test123", "name": "Test User", "email": "test@example.com"},
+        )
+
+    def test_from_item_extra_attributes(self):
+        self.item["age"] = {"N": "42"}
+        self.item["tags"] = {"SS": ["a"]}
+
+        record = User.from_item(self.item)
+
+        self.assertEqual(record.extra, {"age": Decimal("42"), "tags": {"a"}})
+        self.assertEqual(record.to_dict()["age"], Decimal("42"))
+
+    def test_projected_item(self):
+        record = User.from_item({"name": {"S": "Test User"}})
+
+        self.assertEqual(record.to_dict(), {"name": "Test User"})
+
+    def test_records_have_no_instance_dict(self):
+        self.assertFalse(hasattr(User.from_item(self.item), "__dict__"))
+
+    def test_serialized_at_the_edge(self):
+        with app.app_context():
+            body = app.json.dumps([User.from_item(self.item)])
+
+        self.assertIn('"user_id":"test123"', body.replace(" ", ""))
+
+
+@patch("api.models.FAST_PATH", True)
+class TestUserModelFastPath(unittest.TestCase):
+    def setUp(self):
+        self.mock_client = MagicMock()
+        patcher = patch(
+            "api.dynamodb.get_dynamodb_client", return_value=self.mock_client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_scan_page_uses_low_level_client(self):
+        self.mock_client.scan.return_value = {
+            "Items": [{"user_id": {"S": "test123"}}],
+            "LastEvaluatedKey": {"user_id": {"S": "test123"}},
+        }
+
+        records, cursor = UserModel.scan_page(
+            limit=1, cursor=encode_cursor({"user_id": "test000"})
+        )
+
+        self.mock_client.scan.assert_called_once_with(
+            TableName="user_table",
+            Limit=1,
+            ExclusiveStartKey={"user_id": {"S": "test000"}},
+        )
+        self.assertEqual(records, [User(user_id="test123")])
+        self.assertEqual(decode_cursor(cursor), {"user_id": "test123"})
+
+    def test_scan_segment_uses_low_level_client(self):
+        self.mock_client.scan.side_effect = [
+            {
+                "Items": [{"user_id": {"S": "a"}}],
+                "LastEvaluatedKey": {"user_id": {"S": "a"}},
+            },
+            {"Items": [{"user_id": {"S": "b"}}]},
+        ]
+
+        records = UserModel.scan_segment(0, 2)
+
+        self.assertEqual([r.user_id for r in records], ["a", "b"])
+        self.mock_client.scan.assert_called_with(
+            TableName="user_table",
+            Segment=0,
+            TotalSegments=2,
+            ExclusiveStartKey={"user_id": {"S": "a"}},
+        )
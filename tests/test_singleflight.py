@@ -0,0 +1,154 @@
+import threading
+import time
+import unittest
+from concurrent import futures
+from unittest.mock import MagicMock, patch
+
+from api.models import UserModel
+from api.singleflight import SingleFlight
+
+
+def blocking(result=None, error=None):
+    # A call that stays in flight until the test releases it
+    release = threading.Event()
+    started = threading.Event()
+
+    def func(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        if error is not None:
+            raise error
+        return result
+
+    return MagicMock(side_effect=func), started, release
+
+
+def wait_for_followers(flight, count):
+    deadline = time.monotonic() + 5
+    while flight.stats()["collapsed"] < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+
+    def test_concurrent_callers_share_one_call(self):
+        func, started, release = blocking(result={"user_id": "1"})
+        with futures.ThreadPoolExecutor(max_workers=4) as executor:
+            leader = executor.submit(self.flight.do, "1", func)
+            started.wait(5)
+            followers = [executor.submit(self.flight.do, "1", func) for _ in range(3)]
+            wait_for_followers(self.flight, 3)
+            release.set()
+            results = [leader.result()] + [f.result() for f in followers]
+
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(results, [{"user_id": "1"}] * 4)
+        self.assertEqual(self.flight.stats()["calls"], 1)
+        self.assertEqual(self.flight.stats()["collapsed"], 3)
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+    def test_followers_get_copies(self):
+        func, started, release = blocking(result=[{"user_id": "1"}])
+        with futures.ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(self.flight.do, "1", func, list)
+            started.wait(5)
+            follower = executor.submit(self.flight.do, "1", func, list)
+            wait_for_followers(self.flight, 1)
+            release.set()
+
+            self.assertEqual(follower.result(), leader.result())
+            self.assertIsNot(follower.result(), leader.result())
+
+    def test_error_is_shared(self):
+        func, started, release = blocking(error=Exception("DoesNotExist"))
+        with futures.ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(self.flight.do, "1", func)
+            started.wait(5)
+            follower = executor.submit(self.flight.do, "1", func)
+            wait_for_followers(self.flight, 1)
+            release.set()
+
+            for future in (leader, follower):
+                with self.assertRaises(Exception) as ctx:
+                    future.result()
+                self.assertEqual(str(ctx.exception), "DoesNotExist")
+        self.assertEqual(func.call_count, 1)
+
+    def test_sequential_calls_are_not_collapsed(self):
+        func = MagicMock(return_value=1)
+
+        self.flight.do("1", func)
+        self.flight.do("1", func)
+
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(self.flight.stats()["collapsed"], 0)
+
+    def test_forget_starts_a_fresh_call(self):
+        func, started, release = blocking(result="old")
+        with futures.ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(self.flight.do, "1", func)
+            started.wait(5)
+            self.flight.forget(lambda key: key == "1")
+
+            self.assertEqual(self.flight.do("1", lambda: "new"), "new")
+            release.set()
+            self.assertEqual(leader.result(), "old")
+
+    def test_disabled_calls_through(self):
+        flight = SingleFlight(enabled=False)
+
+        self.assertEqual(flight.do("1", lambda: 1), 1)
+        self.assertEqual(flight.stats()["calls"], 0)
+
+
+class TestUserModelCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        patcher = patch("api.models.user_reads", self.flight)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("api.models.get_user_table")
+    def test_concurrent_gets_share_get_item(self, mock_get_table):
+        get_item, started, release = blocking(result={"Item": {"user_id": "1"}})
+        mock_get_table.return_value.get_item = get_item
+        with futures.ThreadPoolExecutor(max_workers=3) as executor:
+            first = executor.submit(UserModel.get, "1")
+            started.wait(5)
+            others = [executor.submit(UserModel.get, "1") for _ in range(2)]
+            wait_for_followers(self.flight, 2)
+            release.set()
+            users = [first.result()] + [f.result() for f in others]
+
+        get_item.assert_called_once_with(Key={"user_id": "1"})
+        self.assertEqual(users, [{"user_id": "1"}] * 3)
+        # Each caller gets its own copy of the shared item
+        self.assertIsNot(users[0], users[1])
+
+    @patch("api.models.FAST_PATH", False)
+    @patch("api.models.get_user_table")
+    def test_concurrent_scan_pages_get_their_own_items(self, mock_get_table):
+        flight = SingleFlight()
+        patcher = patch("api.models.scan_pages", flight)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        scan, started, release = blocking(result={"Items": [{"user_id": "1"}]})
+        mock_get_table.return_value.scan = scan
+        with futures.ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(UserModel.scan_page, limit=10)
+            started.wait(5)
+            second = executor.submit(UserModel.scan_page, limit=10)
+            wait_for_followers(flight, 1)
+            release.set()
+            (leader_items, _), (follower_items, _) = first.result(), second.result()
+
+        scan.assert_called_once()
+        self.assertEqual(follower_items, leader_items)
+        self.assertIsNot(follower_items, leader_items)
+        self.assertIsNot(follower_items[0], leader_items[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,394 @@
+import os
+import tempfile
+import threading
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+from api import dynamodb
+from api.models import UserModel
+from api.storage import MemoryResource
+from tests.helpers import make_user
+
+
+def versioned(user, version=1):
+    return dict(user, version=version)
+
+
+class TestMemoryTable(unittest.TestCase):
+    def setUp(self):
+        self.table = MemoryResource().Table("user_table")
+        for i in range(10):
+            self.table.put_item(Item=make_user(i))
+
+    def test_get_put_delete(self):
+        self.assertEqual(
+            self.table.get_item(Key={"user_id": "user001"})["Item"], make_user(1)
+        )
+
+        response = self.table.delete_item(
+            Key={"user_id": "user001"}, ReturnValues="ALL_OLD"
+        )
+
+        self.assertEqual(response["Attributes"], make_user(1))
+        self.assertEqual(self.table.get_item(Key={"user_id": "user001"}), {})
+
+    def test_put_returns_old_item(self):
+        response = self.table.put_item(
+            Item=dict(make_user(1), name="Renamed"), ReturnValues="ALL_OLD"
+        )
+
+        self.assertEqual(response["Attributes"], make_user(1))
+        self.assertEqual(self.table.put_item(Item=make_user(50)), {})
+
+    def test_stored_items_are_copies(self):
+        item = self.table.get_item(Key={"user_id": "user002"})["Item"]
+        item["name"] = "Mutated"
+
+        self.assertEqual(
+            self.table.get_item(Key={"user_id": "user002"})["Item"], make_user(2)
+        )
+
+    def test_update_item_expressions(self):
+        response = self.table.update_item(
+            Key={"user_id": "user001"},
+            UpdateExpression="SET #name = :name, #score = if_not_exists(#score, :zero)"
+            " + :one ADD #tags :tags REMOVE #email",
+            ExpressionAttributeNames={
+                "#name": "name",
+                "#score": "score",
+                "#tags": "tags",
+                "#email": "email",
+            },
+            ExpressionAttributeValues={
+                ":name": "Renamed",
+                ":zero": Decimal(0),
+                ":one": Decimal(1),
+                ":tags": {"a"},
+            },
+            ReturnValues="UPDATED_NEW",
+        )
+
+        self.assertEqual(
+            response["Attributes"],
+            {"name": "Renamed", "score": Decimal(1), "tags": {"a"}},
+        )
+        self.assertEqual(
+            self.table.get_item(Key={"user_id": "user001"})["Item"],
+            {"user_id": "user001", "name": "Renamed", "score": 1, "tags": {"a"}},
+        )
+
+    def test_update_item_creates_missing_item(self):
+        self.table.update_item(
+            Key={"user_id": "new"},
+            UpdateExpression="ADD total :delta",
+            ExpressionAttributeValues={":delta": 2},
+        )
+
+        self.assertEqual(
+            self.table.get_item(Key={"user_id": "new"})["Item"],
+            {"user_id": "new", "total": 2},
+        )
+
+    def test_update_item_rejects_key_updates(self):
+        with self.assertRaises(ClientError):
+            self.table.update_item(
+                Key={"user_id": "user001"},
+                UpdateExpression="SET user_id = :id",
+                ExpressionAttributeValues={":id": "other"},
+            )
+
+    def test_condition_expressions(self):
+        self.table.update_item(
+            Key={"user_id": "user001"},
+            UpdateExpression="SET version = :one",
+            ConditionExpression="attribute_exists(#id) AND #name = :name",
+            ExpressionAttributeNames={"#id": "user_id", "#name": "name"},
+            ExpressionAttributeValues={":one": 1, ":name": "User 1"},
+        )
+        self.assertEqual(
+            self.table.get_item(Key={"user_id": "user001"})["Item"]["version"], 1
+        )
+
+        failing = [
+            ("update_item", "attribute_exists(user_id)", {"Key": {"user_id": "x"}}),
+            ("put_item", "attribute_not_exists(user_id)", {"Item": make_user(2)}),
+            ("delete_item", "version <> :one", {"Key": {"user_id": "user001"}}),
+        ]
+        for method, condition, kwargs in failing:
+            with self.subTest(method=method):
+                if method == "update_item":
+                    kwargs["UpdateExpression"] = "SET version = :one"
+                with self.assertRaises(ClientError) as context:
+                    getattr(self.table, method)(
+                        ConditionExpression=condition,
+                        ExpressionAttributeValues={":one": 1},
+                        **kwargs,
+                    )
+                self.assertEqual(
+                    context.exception.response["Error"]["Code"],
+                    "ConditionalCheckFailedException",
+                )
+        self.assertNotIn("Item", self.table.get_item(Key={"user_id": "x"}))
+        self.assertIn("Item", self.table.get_item(Key={"user_id": "user001"}))
+
+    def test_condition_failure_returns_old_item(self):
+        with self.assertRaises(ClientError) as context:
+            self.table.put_item(
+                Item=make_user(1),
+                ConditionExpression="attribute_not_exists(user_id)",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+
+        self.assertEqual(
+            context.exception.response["Item"],
+            {
+                "user_id": {"S": "user001"},
+                "name": {"S": "User 1"},
+                "email": {"S": "u1@example.com"},
+            },
+        )
+
+    def test_invalid_key_raises_client_error(self):
+        with self.assertRaises(ClientError):
+            self.table.get_item(Key={"id": "user001"})
+
+    def test_non_string_key_is_rejected(self):
+        for call in (
+            lambda: self.table.put_item(Item=dict(make_user(1), user_id=5)),
+            lambda: self.table.get_item(Key={"user_id": 5}),
+            lambda: self.table.delete_item(Key={"user_id": ""}),
+        ):
+            with self.assertRaises(ClientError) as context:
+                call()
+            error = context.exception.response["Error"]
+            self.assertEqual(error["Code"], "ValidationException")
+
+        # The sorted key list is untouched, so the table keeps working
+        self.table.put_item(Item=make_user(10))
+        self.assertEqual(self.table.scan()["Count"], 11)
+
+    def test_scan_pagination(self):
+        seen = []
+        kwargs = {"Limit": 4}
+        while True:
+            response = self.table.scan(**kwargs)
+            seen.extend(item["user_id"] for item in response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        self.assertEqual(seen, [f"user{i:03d}" for i in range(10)])
+
+    def test_scan_segments_partition_the_table(self):
+        segments = [
+            self.table.scan(Segment=s, TotalSegments=3)["Items"] for s in range(3)
+        ]
+
+        ids = sorted(item["user_id"] for items in segments for item in items)
+        self.assertEqual(ids, [f"user{i:03d}" for i in range(10)])
+
+    def test_projection(self):
+        response = self.table.scan(
+            Limit=1,
+            ProjectionExpression="#f0",
+            ExpressionAttributeNames={"#f0": "name"},
+        )
+
+        self.assertEqual(response["Items"], [{"name": "User 0"}])
+
+    def test_query_key_condition(self):
+        response = self.table.query(
+            IndexName="email-index",
+            KeyConditionExpression="#email = :email",
+            ExpressionAttributeNames={"#email": "email"},
+            ExpressionAttributeValues={":email": "u7@example.com"},
+        )
+
+        self.assertEqual(response["Items"], [make_user(7)])
+
+
+class TestMemoryResource(unittest.TestCase):
+    def test_batch_get_and_write(self):
+        resource = MemoryResource()
+        resource.batch_write_item(
+            RequestItems={
+                "user_table": [{"PutRequest": {"Item": make_user(i)}} for i in range(3)]
+            }
+        )
+        resource.batch_write_item(
+            RequestItems={
+                "user_table": [{"DeleteRequest": {"Key": {"user_id": "user000"}}}]
+            }
+        )
+
+        response = resource.batch_get_item(
+            RequestItems={
+                "user_table": {"Keys": [{"user_id": "user000"}, {"user_id": "user002"}]}
+            }
+        )
+
+        self.assertEqual(response["Responses"]["user_table"], [make_user(2)])
+        self.assertEqual(response["UnprocessedKeys"], {})
+
+    def test_transact_write_items_is_all_or_nothing(self):
+        resource = MemoryResource(keys={"counters": "counter_id"})
+        users = resource.Table("user_table")
+        counters = resource.Table("counters")
+        users.put_item(Item=make_user(1))
+        count = {
+            "Update": {
+                "TableName": "counters",
+                "Key": {"counter_id": "users#0"},
+                "UpdateExpression": "ADD #total :delta",
+                "ExpressionAttributeNames": {"#total": "total"},
+                "ExpressionAttributeValues": {":delta": 1},
+            }
+        }
+
+        def put(i):
+            return {
+                "Put": {
+                    "TableName": "user_table",
+                    "Item": make_user(i),
+                    "ConditionExpression": "attribute_not_exists(user_id)",
+                    "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+                }
+            }
+
+        resource.transact_write_items(TransactItems=[put(2), count])
+        with self.assertRaises(ClientError) as ctx:
+            resource.transact_write_items(TransactItems=[put(1), count])
+
+        reasons = ctx.exception.response["CancellationReasons"]
+        self.assertEqual(reasons[0]["Code"], "ConditionalCheckFailed")
+        self.assertEqual(reasons[0]["Item"]["user_id"], {"S": "user001"})
+        self.assertEqual(reasons[1], {"Code": "None"})
+        self.assertEqual(
+            counters.get_item(Key={"counter_id": "users#0"})["Item"]["total"], 1
+        )
+
+    def test_table_keys(self):
+        table = MemoryResource(keys={"counters": "counter_id"}).Table("counters")
+
+        table.put_item(Item={"counter_id": "users#0"})
+
+        with self.assertRaises(ClientError):
+            table.put_item(Item={"user_id": "user001"})
+
+    def test_sqlite_writes_from_tables_on_threads(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.db")
+            resource = MemoryResource(path, keys={"counters": "counter_id"})
+            users = resource.Table("user_table")
+            counters = resource.Table("counters")
+
+            def write(table, key, count):
+                for i in range(count):
+                    table.put_item(Item={key: f"{key}{i}"})
+
+            threads = [
+                threading.Thread(target=write, args=(users, "user_id", 200)),
+                threading.Thread(target=write, args=(counters, "counter_id", 200)),
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            reloaded = MemoryResource(path, keys={"counters": "counter_id"})
+            self.assertEqual(reloaded.Table("user_table").scan()["Count"], 200)
+            self.assertEqual(reloaded.Table("counters").scan()["Count"], 200)
+
+    def test_sqlite_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.db")
+            table = MemoryResource(path).Table("user_table")
+            table.put_item(
+                Item=dict(make_user(1), score=Decimal("1.5"), tags={"a", "b"})
+            )
+            table.put_item(Item=make_user(2))
+            table.delete_item(Key={"user_id": "user002"})
+
+            reloaded = MemoryResource(path).Table("user_table")
+
+            self.assertEqual(
+                reloaded.scan()["Items"],
+                [dict(make_user(1), score=Decimal("1.5"), tags={"a", "b"})],
+            )
+
+
+class TestUserModelOnMemoryBackend(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("api.dynamodb.dynamodb_resource", dynamodb.memory_resource())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_crud_and_pagination(self):
+        written, failures = UserModel.batch_create((i, make_user(i)) for i in range(30))
+        UserModel.create(make_user(30))
+
+        self.assertEqual((written, failures), (30, []))
+        self.assertEqual(UserModel.get("user030"), versioned(make_user(30)))
+        self.assertEqual(len(UserModel.scan()), 31)
+        page, cursor = UserModel.scan_page(limit=10)
+        self.assertEqual(len(page), 10)
+        self.assertEqual(
+            UserModel.scan_page(limit=10, cursor=cursor)[0][0], versioned(make_user(10))
+        )
+        self.assertEqual(len(UserModel.parallel_scan(total_segments=4)), 31)
+        self.assertEqual(
+            UserModel.find_by_email("u5@example.com"), [versioned(make_user(5))]
+        )
+        users, missing = UserModel.batch_get(["user001", "nope"])
+        self.assertEqual((users, missing), ([versioned(make_user(1))], ["nope"]))
+
+        self.assertEqual(
+            UserModel.update("user030", {"name": "Renamed"}),
+            {"name": "Renamed", "version": 2},
+        )
+        UserModel.update("user030", {"email": "new@example.com"}, expected_version=2)
+        self.assertEqual(UserModel.find_by_email("new@example.com")[0]["version"], 3)
+        with self.assertRaises(Exception) as context:
+            UserModel.update("user030", {"name": "Stale"}, expected_version=2)
+        self.assertEqual(str(context.exception), "VersionConflict")
+        self.assertEqual(UserModel.get("user030")["name"], "Renamed")
+
+        UserModel.delete("user030")
+        with self.assertRaises(Exception) as context:
+            UserModel.get("user030")
+        self.assertEqual(str(context.exception), "DoesNotExist")
+
+    def test_overwrites_carry_the_version_forward(self):
+        UserModel.create(make_user(1))
+        UserModel.update("user001", {"name": "Patched"}, expected_version=1)
+
+        self.assertEqual(UserModel.create(make_user(1))["version"], 3)
+        UserModel.batch_create([(0, make_user(1)), (1, make_user(2))])
+        self.assertEqual(UserModel.get("user001")["version"], 4)
+        self.assertEqual(UserModel.get("user002")["version"], 1)
+        # The version read before the overwrites no longer matches
+        with self.assertRaises(Exception) as context:
+            UserModel.update("user001", {"name": "Stale"}, expected_version=1)
+        self.assertEqual(str(context.exception), "VersionConflict")
+
+    def test_unversioned_items_are_version_zero(self):
+        table = dynamodb.get_user_table()
+        table.put_item(Item=make_user(1))
+
+        with self.assertRaises(Exception) as context:
+            UserModel.update("user001", {"name": "Stale"}, expected_version=1)
+        self.assertEqual(str(context.exception), "VersionConflict")
+        self.assertEqual(
+            UserModel.update("user001", {"name": "New"}, expected_version=0)["version"],
+            1,
+        )
+        table.put_item(Item=make_user(2))
+        self.assertEqual(UserModel.create(make_user(2))["version"], 1)
+
+    def test_update_missing_user_with_version(self):
+        with self.assertRaises(Exception) as context:
+            UserModel.update("nope", {"name": "New"}, expected_version=3)
+        self.assertEqual(str(context.exception), "DoesNotExist")
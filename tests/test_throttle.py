@@ -0,0 +1,150 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+
+from api import throttle
+from api.app import app
+from api.throttle import CapacityExceeded, TokenBucket
+from tests.helpers import FakeClock
+
+
+def throttling_error():
+    return ClientError(
+        {"Error": {"Code": "ProvisionedThroughputExceededException", "Message": ""}},
+        "PutItem",
+    )
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(rate=2, burst_seconds=1, clock=self.clock)
+
+    def test_burst_is_served_without_waiting(self):
+        self.assertEqual(self.bucket.reserve(1), 0)
+        self.assertEqual(self.bucket.reserve(1), 0)
+        self.assertEqual(self.bucket.reserve(1), 0.5)
+
+    def test_large_requests_are_paced(self):
+        self.assertEqual(self.bucket.reserve(6), 2.0)
+        # The debt is carried over to the next caller
+        self.assertEqual(self.bucket.reserve(1), 2.5)
+
+    def test_refills_over_time(self):
+        self.bucket.reserve(2)
+        self.clock.now = 0.5
+
+        self.assertEqual(self.bucket.reserve(1), 0)
+
+    def test_wait_limit_raises(self):
+        self.bucket.reserve(2)
+
+        with self.assertRaises(CapacityExceeded) as ctx:
+            self.bucket.reserve(2, wait=0.5)
+        self.assertEqual(ctx.exception.retry_after, 1.0)
+        # A rejected request does not consume capacity
+        self.assertEqual(self.bucket.tokens, 0)
+
+    def test_charge_settles_consumed_capacity(self):
+        self.bucket.charge(1.5)
+        self.assertEqual(self.bucket.tokens, 0.5)
+        self.bucket.charge(-5)
+        self.assertEqual(self.bucket.tokens, 2)
+
+
+class TestThrottledCall(unittest.TestCase):
+    def setUp(self):
+        self.bucket = TokenBucket(rate=100)
+        patcher = patch.dict(throttle.buckets, {"read": None, "write": self.bucket})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("api.throttle.backoff")
+    def test_throttling_raises_capacity_exceeded_without_retrying(self, backoff):
+        # botocore's standard retry mode is the only retry layer
+        func = MagicMock(side_effect=throttling_error())
+
+        with self.assertRaises(CapacityExceeded):
+            throttle.call("write", func, Item={"user_id": "1"})
+        func.assert_called_once_with(Item={"user_id": "1"})
+        backoff.assert_not_called()
+
+    def test_other_errors_propagate(self):
+        error = ClientError({"Error": {"Code": "ValidationException"}}, "PutItem")
+        func = MagicMock(side_effect=error)
+
+        with self.assertRaises(ClientError):
+            throttle.call("write", func)
+        func.assert_called_once()
+
+    def test_consumed_capacity_is_charged(self):
+        tokens = self.bucket.tokens
+        func = MagicMock(return_value={"ConsumedCapacity": {"CapacityUnits": 3.0}})
+
+        throttle.call("write", func, units=1)
+
+        self.assertEqual(self.bucket.tokens, tokens - 3)
+
+    def test_disabled_bucket_passes_through(self):
+        func = MagicMock(return_value={"Item": {}})
+
+        self.assertEqual(
+            throttle.call("read", func, Key={"user_id": "1"}), {"Item": {}}
+        )
+
+
+class TestRequestDeadline(unittest.TestCase):
+    def setUp(self):
+        # A scan page charged far more than the provisioned rate
+        self.bucket = TokenBucket(rate=1)
+        self.bucket.tokens = -120
+        patcher = patch.dict(throttle.buckets, {"read": self.bucket})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("api.throttle.time.sleep")
+    def test_paced_calls_outside_requests_wait(self, sleep):
+        throttle.call("read", MagicMock(return_value={}), paced=True)
+
+        sleep.assert_called_once()
+        self.assertGreater(sleep.call_args.args[0], 100)
+
+    def test_paced_calls_in_requests_hit_the_deadline(self):
+        func = MagicMock(return_value={})
+        with app.test_request_context():
+            app.preprocess_request()
+            with self.assertRaises(CapacityExceeded) as ctx:
+                throttle.call("read", func, paced=True)
+
+        self.assertGreater(ctx.exception.retry_after, 100)
+        func.assert_not_called()
+
+    def test_bind_carries_the_deadline_to_threads(self):
+        func = MagicMock(return_value={})
+        errors = []
+
+        def scan():
+            try:
+                throttle.call("read", func, paced=True)
+            except CapacityExceeded as e:
+                errors.append(e)
+
+        with app.test_request_context():
+            app.preprocess_request()
+            worker = threading.Thread(target=throttle.bind(scan))
+        worker.start()
+        worker.join(5)
+
+        self.assertEqual(len(errors), 1)
+
+    def test_paced_routes_return_429(self):
+        response = app.test_client().get("/users?parallel=1")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,7 @@ from unittest.mock import patch
 from flask import Flask, template_rendered
 
 from api import views
+from api.app import app
 
 
 @contextmanager
@@ -22,13 +23,12 @@ def captured_templates(app):
         template_rendered.disconnect(record, app)
 
 
+HTML = {"Accept": "text/html,application/xhtml+xml,*/*;q=0.8"}
+
+
 class TestViews(unittest.TestCase):
-    @classmethod
-    def setUpClass(cls):
-        cls.app = Flask(__name__)
-        cls.app.config["TESTING"] = True
-        cls.app.secret_key = "test_secret_key"
-        cls.app.register_blueprint(views.bp)
+    # The full app: GET /users/<user_id> is negotiated by its get_user route
+    app = app
 
     def setUp(self):
         self.client = self.app.test_client()
@@ -38,9 +38,9 @@ class TestViews(unittest.TestCase):
             "email": "test@example.com",
         }
 
-    @patch("api.views.UserModel.scan")
+    @patch("api.views.UserModel.scan_page")
     def test_index_success(self, mock_scan):
-        mock_scan.return_value = [self.mock_user]
+        mock_scan.return_value = ([self.mock_user], None)
 
         with captured_templates(self.app) as templates:
             response = self.client.get("/")
@@ -50,8 +50,54 @@ class TestViews(unittest.TestCase):
             template, context = templates[0]
             self.assertEqual(template.name, "index.html")
             self.assertEqual(context["users"], [self.mock_user])
+            self.assertIsNone(context["next_cursor"])
+            mock_scan.assert_called_once_with(
+                limit=views.INDEX_PAGE_SIZE, cursor=None, fields=views.INDEX_FIELDS
+            )
+
+    @patch("api.views.UserModel.scan_page")
+    def test_index_links_next_page(self, mock_scan):
+        mock_scan.return_value = ([self.mock_user], "page-2")
+
+        response = self.client.get("/?cursor=page-1")
+
+        mock_scan.assert_called_once_with(
+            limit=views.INDEX_PAGE_SIZE, cursor="page-1", fields=views.INDEX_FIELDS
+        )
+        self.assertIn(b'href="/?cursor=page-2"', response.data)
+
+    @patch("api.views.UserModel.count")
+    @patch("api.views.UserModel.scan_page")
+    def test_index_shows_total(self, mock_scan, mock_count):
+        mock_scan.return_value = ([self.mock_user], None)
+        mock_count.return_value = 7
+
+        response = self.client.get("/")
+
+        self.assertIn(b"7 users in total", response.data)
+
+    @patch("api.views.UserModel.count")
+    @patch("api.views.UserModel.scan_page")
+    def test_index_renders_without_total(self, mock_scan, mock_count):
+        mock_scan.return_value = ([self.mock_user], None)
+        mock_count.side_effect = Exception("Counter table missing")
+
+        with captured_templates(self.app) as templates:
+            response = self.client.get("/")
+
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(templates[0][1]["total"])
+
+    @patch("api.views.UserModel.scan_page")
+    def test_index_not_modified(self, mock_scan):
+        mock_scan.return_value = ([self.mock_user], None)
+
+        etag = self.client.get("/").headers["ETag"]
+        response = self.client.get("/", headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
 
-    @patch("api.views.UserModel.scan")
+    @patch("api.views.UserModel.scan_page")
     def test_index_error(self, mock_scan):
         mock_scan.side_effect = Exception("Database error")
 
@@ -117,7 +163,7 @@ class TestViews(unittest.TestCase):
         mock_get.return_value = self.mock_user
 
         with captured_templates(self.app) as templates:
-            response = self.client.get("/users/test123")
+            response = self.client.get("/users/test123", headers=HTML)
 
             self.assertEqual(response.status_code, 200)
             self.assertEqual(len(templates), 1)
@@ -130,7 +176,7 @@ class TestViews(unittest.TestCase):
         mock_get.side_effect = Exception("DoesNotExist")
 
         with captured_templates(self.app) as templates:
-            response = self.client.get("/users/nonexistent")
+            response = self.client.get("/users/nonexistent", headers=HTML)
 
             self.assertEqual(response.status_code, 404)
             self.assertEqual(len(templates), 1)
@@ -143,7 +189,7 @@ class TestViews(unittest.TestCase):
         mock_get.side_effect = Exception("Database error")
 
         with captured_templates(self.app) as templates:
-            response = self.client.get("/users/test123")
+            response = self.client.get("/users/test123", headers=HTML)
 
             self.assertEqual(response.status_code, 200)
             self.assertEqual(len(templates), 1)
@@ -198,9 +244,9 @@ class TestViewsIntegration(unittest.TestCase):
     def tearDown(self):
         self.patcher.stop()
 
-    @patch("api.views.UserModel.scan")
+    @patch("api.views.UserModel.scan_page")
     def test_index_renders_with_users(self, mock_scan):
-        mock_scan.return_value = [self.mock_user]
+        mock_scan.return_value = ([self.mock_user], None)
 
         response = self.client.get("/")
 